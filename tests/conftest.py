@@ -1,5 +1,7 @@
 import os
 
+import pytest
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 root_dir_content = os.listdir(BASE_DIR)
 PROJECT_DIR_NAME = 'yatube'
@@ -37,3 +39,19 @@ pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True)
+def inline_thumbnails(settings):
+    """Миниатюры строятся в запросе, а не в фоне, чтобы не
+    писать во временный MEDIA_ROOT, пока тест его удаляет."""
+    settings.THUMBNAIL_WORKERS = 0
+
+
+@pytest.fixture(autouse=True, scope='session')
+def isolated_cache():
+    """Свой файл общего кеша, как у manage.py test."""
+    from core.runner import isolated_cache
+
+    with isolated_cache():
+        yield
@@ -1,10 +1,20 @@
 from django.urls import path
 
+from core.routers import read_replica
+
 from . import views
 
 app_name = 'about'
 
 urlpatterns = [
-    path('author/', views.AboutAuthorView.as_view(), name='author'),
-    path('tech/', views.AboutTechView.as_view(), name='tech'),
+    path(
+        'author/',
+        read_replica(views.AboutAuthorView.as_view()),
+        name='author',
+    ),
+    path(
+        'tech/',
+        read_replica(views.AboutTechView.as_view()),
+        name='tech',
+    ),
 ]
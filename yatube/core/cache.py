@@ -0,0 +1,450 @@
+"""Двухуровневый кеш: маленький LRU в процессе перед общим кешем.
+
+Первый уровень живёт в памяти процесса и отвечает без обращения к общему
+кешу, второй — любой бэкенд из ``CACHES``, который видят все процессы
+(например, ``SQLiteCache`` ниже). Каждая запись во второй уровень
+попадает в кольцевой журнал инвалидаций там же, а процессы не чаще раза
+в ``SYNC_INTERVAL`` секунд дочитывают журнал и выбрасывают изменённые
+ключи из своего LRU.
+
+Настройка::
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.TwoTierCache',
+            'LOCATION': 'shared',
+            'OPTIONS': {'MAX_ENTRIES': 1000, 'LOCAL_TIMEOUT': 5},
+        },
+        'shared': {
+            'BACKEND': 'core.cache.SQLiteCache',
+            'LOCATION': '/tmp/yatube-cache.sqlite3',
+        },
+    }
+"""
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from . import profiling
+
+SEQUENCE_KEY = 'two-tier:sequence'
+EVENT_KEY = 'two-tier:event:{}'
+# Событие «сбросить всё» вместо имени ключа.
+CLEAR = ''
+MISSING = object()
+
+
+class LocalTier:
+    """LRU ограниченного размера с TTL, общий для потоков процесса."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.seen = None
+        self.own = set()
+        self.synced = 0.0
+        self.stats = {
+            'local': {'hits': 0, 'misses': 0},
+            'shared': {'hits': 0, 'misses': 0},
+        }
+
+    def get(self, key: str):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self.entries[key]
+                entry = None
+            if entry is not None:
+                self.entries.move_to_end(key)
+        self.count('local', entry is not None)
+        return MISSING if entry is None else pickle.loads(entry[1])
+
+    def set(self, key: str, value, timeout: float) -> None:
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.entries[key] = (time.monotonic() + timeout, data)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+    def count(self, tier: str, hit: bool) -> None:
+        with self.lock:
+            self.stats[tier]['hits' if hit else 'misses'] += 1
+        profiling.record_cache(tier, hit)
+
+
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+class TwoTierCache(BaseCache):
+    """Кеш с LRU процесса перед общим кешем ``LOCATION``.
+
+    ``OPTIONS``: ``MAX_ENTRIES`` — размер LRU, ``LOCAL_TIMEOUT`` — сколько
+    секунд запись живёт в LRU, ``SYNC_INTERVAL`` — как часто читать журнал
+    инвалидаций, ``JOURNAL_SIZE`` и ``JOURNAL_TIMEOUT`` — сколько событий
+    журнала хранится по кругу и как долго. Процесс, отставший больше чем
+    на весь журнал, просто очищает свой LRU.
+    """
+
+    def __init__(self, location: str, params: dict) -> None:
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.shared_alias = location
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self.sync_interval = options.get('SYNC_INTERVAL', 0.5)
+        self.journal_timeout = options.get('JOURNAL_TIMEOUT', 60)
+        self.journal_size = options.get('JOURNAL_SIZE', 128)
+        with _tiers_lock:
+            self.local = _tiers.setdefault(
+                location, LocalTier(self._max_entries)
+            )
+
+    @property
+    def shared(self) -> BaseCache:
+        return caches[self.shared_alias]
+
+    def stats(self) -> dict:
+        """Попадания и промахи по уровням с момента запуска процесса."""
+        with self.local.lock:
+            return {
+                tier: dict(counters)
+                for tier, counters in self.local.stats.items()
+            }
+
+    def _local_key(self, key: str, version: int = None) -> str:
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _local_timeout(self, timeout) -> float:
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is None:
+            return self.local_timeout
+        return min(timeout - time.time(), self.local_timeout)
+
+    def _publish(self, keys: list) -> None:
+        """Записывает изменённые ключи в журнал для других процессов."""
+        shared = self.shared
+        for key in keys:
+            try:
+                sequence = shared.incr(SEQUENCE_KEY)
+            except ValueError:
+                shared.add(SEQUENCE_KEY, 0, None)
+                sequence = shared.incr(SEQUENCE_KEY)
+            shared.set(
+                EVENT_KEY.format(sequence % self.journal_size),
+                (sequence, key),
+                self.journal_timeout,
+            )
+            with self.local.lock:
+                self.local.own.add(sequence)
+
+    def _sync(self) -> None:
+        """Выбрасывает из LRU ключи, изменённые другими процессами."""
+        local = self.local
+        now = time.monotonic()
+        if now - local.synced < self.sync_interval:
+            return
+        local.synced = now
+        shared = self.shared
+        current = shared.get(SEQUENCE_KEY, 0)
+        with local.lock:
+            seen, local.seen = local.seen, current
+            own, local.own = local.own, set()
+        if seen is None or current == seen:
+            return
+        if current < seen:
+            # Журнал начался заново: общий кеш очистили или вытеснили.
+            local.clear()
+            return
+        if current - seen > self.journal_size:
+            local.clear()
+            return
+        wanted = {
+            EVENT_KEY.format(sequence % self.journal_size): sequence
+            for sequence in range(seen + 1, current + 1)
+            if sequence not in own
+        }
+        events = shared.get_many(list(wanted)) if wanted else {}
+        keys = []
+        for slot, sequence in wanted.items():
+            event = events.get(slot)
+            # Событие вытеснено или уже перезаписано более новым.
+            if event is None or event[0] != sequence or event[1] == CLEAR:
+                local.clear()
+                return
+            keys.append(event[1])
+        for key in keys:
+            local.delete(key)
+
+    def get(self, key, default=None, version=None):
+        local_key = self._local_key(key, version)
+        self._sync()
+        value = self.local.get(local_key)
+        if value is not MISSING:
+            return value
+        value = self.shared.get(key, MISSING, version=version)
+        self.local.count('shared', value is not MISSING)
+        if value is MISSING:
+            return default
+        self.local.set(local_key, value, self.local_timeout)
+        return value
+
+    def get_many(self, keys, version=None):
+        self._sync()
+        found = {}
+        missing = {}
+        for key in keys:
+            local_key = self._local_key(key, version)
+            value = self.local.get(local_key)
+            if value is MISSING:
+                missing[key] = local_key
+            else:
+                found[key] = value
+        if missing:
+            shared = self.shared.get_many(list(missing), version=version)
+            for key, local_key in missing.items():
+                self.local.count('shared', key in shared)
+                if key in shared:
+                    self.local.set(local_key, shared[key], self.local_timeout)
+            found.update(shared)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self._local_key(key, version)
+        self.shared.set(key, value, self._shared_timeout(timeout), version)
+        self.local.set(local_key, value, self._local_timeout(timeout))
+        self._publish([local_key])
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self._local_key(key, version)
+        if not self.shared.add(key, value, self._shared_timeout(timeout),
+                               version):
+            return False
+        self.local.set(local_key, value, self._local_timeout(timeout))
+        self._publish([local_key])
+        return True
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(
+            data, self._shared_timeout(timeout), version
+        )
+        local_keys = []
+        for key, value in data.items():
+            local_key = self._local_key(key, version)
+            self.local.set(local_key, value, self._local_timeout(timeout))
+            local_keys.append(local_key)
+        self._publish(local_keys)
+        return failed
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, self._shared_timeout(timeout), version)
+
+    def incr(self, key, delta=1, version=None):
+        local_key = self._local_key(key, version)
+        value = self.shared.incr(key, delta, version)
+        self.local.delete(local_key)
+        self._publish([local_key])
+        return value
+
+    def delete(self, key, version=None):
+        local_key = self._local_key(key, version)
+        self.shared.delete(key, version)
+        self.local.delete(local_key)
+        self._publish([local_key])
+
+    def delete_many(self, keys, version=None):
+        local_keys = [self._local_key(key, version) for key in keys]
+        self.shared.delete_many(keys, version)
+        for local_key in local_keys:
+            self.local.delete(local_key)
+        self._publish(local_keys)
+
+    def has_key(self, key, version=None):
+        return self.get(key, MISSING, version) is not MISSING
+
+    def clear(self):
+        self.shared.clear()
+        self.local.clear()
+        self._publish([CLEAR])
+
+    def _shared_timeout(self, timeout):
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+
+class SQLiteCache(BaseCache):
+    """Кеш в файле SQLite, общий для всех процессов на машине.
+
+    В отличие от файлового кеша Django, ``incr`` и ``add`` здесь атомарны
+    между процессами, а запись не перечитывает каталог с файлами.
+    ``LOCATION`` — путь к файлу базы.
+    """
+    cull_every = 100
+
+    def __init__(self, location: str, params: dict) -> None:
+        super().__init__(params)
+        self.location = location
+        self.local = threading.local()
+        self.writes = 0
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.location, timeout=5, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB, expires REAL'
+                ') WITHOUT ROWID'
+            )
+            self.local.connection = connection
+        return connection
+
+    def _key(self, key, version=None) -> str:
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _live(self, expires) -> bool:
+        return expires is None or expires > time.time()
+
+    def _write(self, sql: str, params) -> None:
+        self.connection.execute(sql, params)
+        self.writes += 1
+        if self.writes % self.cull_every == 0:
+            self._cull()
+
+    def _cull(self) -> None:
+        connection = self.connection
+        connection.execute(
+            'DELETE FROM cache WHERE expires <= ?', (time.time(),)
+        )
+        (count,) = connection.execute('SELECT COUNT(*) FROM cache').fetchone()
+        if count > self._max_entries:
+            connection.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY expires IS NULL, expires LIMIT ?)',
+                (count // self._cull_frequency,),
+            )
+
+    def get(self, key, default=None, version=None):
+        row = self.connection.execute(
+            'SELECT value, expires FROM cache WHERE key = ?',
+            (self._key(key, version),),
+        ).fetchone()
+        if row is None or not self._live(row[1]):
+            return default
+        return pickle.loads(row[0])
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        found = {}
+        names = list(keys)
+        for start in range(0, len(names), 500):
+            batch = names[start:start + 500]
+            rows = self.connection.execute(
+                'SELECT key, value, expires FROM cache WHERE key IN '
+                f'({", ".join("?" * len(batch))})',
+                batch,
+            )
+            for name, value, expires in rows:
+                if self._live(expires):
+                    found[keys[name]] = pickle.loads(value)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._write(
+            'INSERT OR REPLACE INTO cache (key, value, expires) '
+            'VALUES (?, ?, ?)',
+            (
+                self._key(key, version),
+                pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                self.get_backend_timeout(timeout),
+            ),
+        )
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self.connection.execute(
+            'INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET '
+            'value = excluded.value, expires = excluded.expires '
+            'WHERE cache.expires <= ?',
+            (
+                self._key(key, version),
+                pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                self.get_backend_timeout(timeout),
+                time.time(),
+            ),
+        )
+        return cursor.rowcount > 0
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self.connection.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (
+                self.get_backend_timeout(timeout),
+                self._key(key, version),
+                time.time(),
+            ),
+        )
+        return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        name = self._key(key, version)
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (name,)
+            ).fetchone()
+            if row is None or not self._live(row[1]):
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (pickle.dumps(value, pickle.HIGHEST_PROTOCOL), name),
+            )
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return value
+
+    def delete(self, key, version=None):
+        self.connection.execute(
+            'DELETE FROM cache WHERE key = ?', (self._key(key, version),)
+        )
+
+    def has_key(self, key, version=None):
+        row = self.connection.execute(
+            'SELECT expires FROM cache WHERE key = ?',
+            (self._key(key, version),),
+        ).fetchone()
+        return row is not None and self._live(row[0])
+
+    def clear(self):
+        self.connection.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединение живёт в потоке и переиспользуется между запросами.
+        pass
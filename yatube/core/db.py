@@ -0,0 +1,104 @@
+"""Настройка соединений SQLite под конкурентные процессы gunicorn."""
+import random
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+
+from . import profiling
+
+_stats = {
+    'transactions': 0,
+    'retries': 0,
+    'failures': 0,
+    'wait_ms': 0.0,
+    'max_wait_ms': 0.0,
+}
+_stats_lock = threading.Lock()
+
+
+def configure_sqlite(sender, connection, **kwargs) -> None:
+    """Применяет SQLITE_PRAGMAS к каждому новому соединению SQLite.
+
+    Обработчик сигнала ``connection_created``. В режиме WAL читатели не
+    ждут писателя, а вместе с CONN_MAX_AGE прагмы выполняются один раз
+    на соединение, а не на каждый запрос.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def _begin_immediate(connection) -> None:
+    connection.cursor().execute('BEGIN IMMEDIATE')
+
+
+def _enter(stack: ExitStack, connection, using) -> None:
+    """Открывает atomic, начиная транзакцию с BEGIN IMMEDIATE.
+
+    Django начинает транзакции SQLite с обычного BEGIN, и блокировка на
+    запись берётся только на первой записи. Если к этому моменту другой
+    процесс уже что-то записал, SQLite сразу отвечает «database is
+    locked», не дожидаясь busy_timeout.
+    """
+    connection.ensure_connection()
+    connection._start_transaction_under_autocommit = (
+        lambda: _begin_immediate(connection)
+    )
+    try:
+        stack.enter_context(transaction.atomic(using))
+    finally:
+        del connection._start_transaction_under_autocommit
+
+
+def _record(wait: float, retries: int, failed: bool) -> None:
+    wait_ms = wait * 1000
+    with _stats_lock:
+        _stats['transactions'] += 1
+        _stats['retries'] += retries
+        _stats['failures'] += failed
+        _stats['wait_ms'] += wait_ms
+        _stats['max_wait_ms'] = max(_stats['max_wait_ms'], wait_ms)
+    profiling.record_lock_wait(wait, retries)
+
+
+@contextmanager
+def immediate(using=None):
+    """``transaction.atomic``, сразу берущий блокировку записи SQLite.
+
+    Если блокировку не удалось получить за busy_timeout, попытка
+    повторяется WRITE_RETRIES раз с экспоненциальной задержкой со
+    случайным разбросом, начиная с WRITE_BACKOFF секунд. Повторяется
+    только BEGIN, так что тело блока выполняется ровно один раз. Внутри
+    другой транзакции и на других СУБД это обычный atomic.
+    """
+    connection = transaction.get_connection(using)
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        with transaction.atomic(using):
+            yield
+        return
+    with ExitStack() as stack:
+        started = time.perf_counter()
+        for attempt in range(settings.WRITE_RETRIES + 1):
+            try:
+                _enter(stack, connection, using)
+                break
+            except OperationalError as error:
+                if ('locked' not in str(error)
+                        or attempt == settings.WRITE_RETRIES):
+                    _record(time.perf_counter() - started, attempt, True)
+                    raise
+                delay = settings.WRITE_BACKOFF * 2 ** attempt
+                time.sleep(random.uniform(delay / 2, delay))
+        _record(time.perf_counter() - started, attempt, False)
+        yield
+
+
+def stats() -> dict:
+    """Транзакции записи и ожидание блокировки с запуска процесса."""
+    with _stats_lock:
+        return dict(_stats)
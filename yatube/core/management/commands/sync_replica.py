@@ -0,0 +1,60 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.signals import replica_sync_started
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в файлы реплик из DATABASE_REPLICAS '
+        'через backup API, не останавливая чтение с них.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Повторять каждые N секунд; по умолчанию один раз. '
+                 f'Обычно {settings.REPLICA_SYNC_INTERVAL}.',
+        )
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError('Команда копирует только базы SQLite.')
+        while True:
+            started = time.monotonic()
+            for alias in settings.DATABASE_REPLICAS:
+                self.sync(primary, alias)
+            if not options['interval']:
+                return
+            time.sleep(max(
+                options['interval'] - (time.monotonic() - started), 0
+            ))
+
+    def sync(self, primary, alias: str) -> None:
+        """Переписывает файл реплики страницами основной базы.
+
+        Файл не подменяется, а обновляется на месте: постоянные соединения
+        читателей продолжают видеть его, а не удалённый inode. Перед
+        копированием отправляется replica_sync_started, чтобы приложения
+        запомнили, какие данные реплика получит.
+        """
+        name = connections[alias].settings_dict['NAME']
+        if name == primary.settings_dict['NAME']:
+            return
+        primary.ensure_connection()
+        replica_sync_started.send(sender=self.__class__, alias=alias)
+        started = time.monotonic()
+        target = sqlite3.connect(name)
+        try:
+            primary.connection.backup(target)
+        finally:
+            target.close()
+        self.stdout.write(
+            f'{alias}: скопировано за '
+            f'{(time.monotonic() - started) * 1000:.0f} мс.'
+        )
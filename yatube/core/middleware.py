@@ -0,0 +1,139 @@
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpRequest, HttpResponse
+
+from . import profiling, routers
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilingMiddleware:
+    """Замеры запроса в заголовке Server-Timing и в журнале.
+
+    Профилируется доля PROFILING_SAMPLE_RATE всех запросов и любой запрос
+    сотрудника с заголовком PROFILING_HEADER. Заголовок Server-Timing
+    получают только сотрудники, остальные замеры попадают лишь в журнал
+    ``core.middleware`` одной строкой JSON.
+    """
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+        profiling.install()
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        requested = self.requested(request)
+        if not requested and not self.sampled():
+            return self.get_response(request)
+        profile = profiling.start()
+        started = time.perf_counter()
+        try:
+            with self.measure(profile):
+                response = self.get_response(request)
+        finally:
+            profiling.stop()
+        if requested:
+            response['Server-Timing'] = self.server_timing(
+                profile, time.perf_counter() - started
+            )
+        if response.streaming:
+            response.streaming_content = self.stream(
+                request, response, response.streaming_content, profile,
+                started,
+            )
+        else:
+            self.log(request, response, profile, started)
+        return response
+
+    @contextmanager
+    def measure(self, profile: profiling.Profile):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(profile.execute)
+                )
+            yield
+
+    def stream(self, request: HttpRequest, response: HttpResponse, content,
+               profile: profiling.Profile, started: float):
+        """Досчитывает SQL тела потокового ответа и пишет журнал в конце.
+
+        Заголовок Server-Timing к этому моменту уже отправлен и описывает
+        только шапку страницы, а строка журнала — весь ответ.
+        """
+        try:
+            with self.measure(profile):
+                yield from content
+        finally:
+            self.log(request, response, profile, started)
+
+    def log(self, request: HttpRequest, response: HttpResponse,
+            profile: profiling.Profile, started: float) -> None:
+        total = time.perf_counter() - started
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'sql_count': profile.sql_count,
+            'sql_ms': round(profile.sql_time * 1000, 2),
+            'template_ms': round(profile.template_time * 1000, 2),
+            'cache': profile.cache,
+            'lock_wait_ms': round(profile.lock_wait * 1000, 2),
+            'lock_retries': profile.lock_retries,
+        }))
+
+    def requested(self, request: HttpRequest) -> bool:
+        if settings.PROFILING_HEADER not in request.META:
+            return False
+        user = getattr(request, 'user', None)
+        return user is not None and user.is_staff
+
+    def sampled(self) -> bool:
+        rate = settings.PROFILING_SAMPLE_RATE
+        return rate > 0 and random.random() < rate
+
+    def server_timing(self, profile: profiling.Profile, total: float) -> str:
+        metrics = [
+            f'sql;dur={profile.sql_time * 1000:.2f};'
+            f'desc="{profile.sql_count} queries"',
+            f'template;dur={profile.template_time * 1000:.2f}',
+        ]
+        if profile.lock_wait or profile.lock_retries:
+            metrics.append(
+                f'db-lock;dur={profile.lock_wait * 1000:.2f};'
+                f'desc="{profile.lock_retries} retries"'
+            )
+        for tier, counters in sorted(profile.cache.items()):
+            metrics.append(
+                f'cache-{tier};desc="{counters["hits"]} hits, '
+                f'{counters["misses"]} misses"'
+            )
+        metrics.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(metrics)
+
+
+class ReplicaMiddleware:
+    """Закрепляет клиента за основной базой после записи.
+
+    Должна стоять выше SessionMiddleware, чтобы увидеть и запись сессии
+    при входе на сайт.
+    """
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        writes = routers.track_writes()
+        response = self.get_response(request)
+        if writes:
+            response.set_cookie(
+                settings.REPLICA_STICKY_COOKIE, '1',
+                max_age=settings.REPLICA_STICKY_SECONDS, httponly=True,
+            )
+        return response
@@ -0,0 +1,85 @@
+"""Сбор замеров одного запроса для ProfilingMiddleware.
+
+Замер живёт в contextvar, поэтому потоки и запросы не мешают друг другу,
+а код вне профилируемого запроса платит только за чтение contextvar.
+"""
+import time
+from contextvars import ContextVar
+
+from django.template.base import Template
+
+_current = ContextVar('profile', default=None)
+
+
+class Profile:
+    """Счётчики запроса: SQL, шаблоны, кеш по уровням и блокировки записи."""
+
+    def __init__(self) -> None:
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache = {}
+        self.lock_wait = 0.0
+        self.lock_retries = 0
+
+    def execute(self, execute, sql, params, many, context):
+        """Обёртка для ``connection.execute_wrapper``."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.sql_count += 1
+
+
+def start() -> Profile:
+    profile = Profile()
+    _current.set(profile)
+    return profile
+
+
+def stop() -> None:
+    _current.set(None)
+
+
+def record_cache(tier: str, hit: bool) -> None:
+    profile = _current.get()
+    if profile is None:
+        return
+    counters = profile.cache.setdefault(tier, {'hits': 0, 'misses': 0})
+    counters['hits' if hit else 'misses'] += 1
+
+
+def record_lock_wait(wait: float, retries: int) -> None:
+    profile = _current.get()
+    if profile is None:
+        return
+    profile.lock_wait += wait
+    profile.lock_retries += retries
+
+
+def _timed_render(render):
+    """Считает время только внешнего шаблона, без вложенных include."""
+
+    def wrapper(self, context):
+        profile = _current.get()
+        if profile is None:
+            return render(self, context)
+        profile.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            profile.template_depth -= 1
+            if not profile.template_depth:
+                profile.template_time += time.perf_counter() - started
+
+    wrapper.profiled = True
+    return wrapper
+
+
+def install() -> None:
+    """Подменяет Template.render один раз на процесс."""
+    if not getattr(Template.render, 'profiled', False):
+        Template.render = _timed_render(Template.render)
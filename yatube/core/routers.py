@@ -0,0 +1,105 @@
+"""Чтение с реплики для представлений, которые ничего не пишут.
+
+Представление, обёрнутое в ``read_replica``, читает с одной из
+DATABASE_REPLICAS, всё остальное и любые записи идут в ``default``.
+ReplicaMiddleware замечает записи и ставит cookie, с которой следующие
+REPLICA_STICKY_SECONDS секунд клиент читает с основной базы и видит
+свои изменения, пока реплика их не догнала. Служебные записи приложений
+из REPLICA_UNTRACKED_APPS не в счёт. Реплику, которую sync_replica
+не обновлял дольше REPLICA_MAX_LAG секунд, запросы обходят.
+"""
+import os
+import random
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Снимок, который приложения пишут перед каждым копированием реплики
+# (replica_sync_started); время копирования лежит в нём под ключом
+# ``synced``.
+SNAPSHOT_KEY = 'generation:replica:{}'
+
+_read_alias = ContextVar('read_alias', default=None)
+_wrote = ContextVar('wrote', default=None)
+
+
+def available(alias: str) -> bool:
+    """Реплика существует, это не та же база, что основная, и её
+    копировали не раньше REPLICA_MAX_LAG секунд назад.
+
+    В тестах реплика — зеркало ``default`` (TEST.MIRROR), и чтение с неё
+    только открыло бы второе соединение к той же базе. Файл, который
+    остался от остановленного sync_replica, отдавал бы сколь угодно
+    старые данные.
+    """
+    name = connections[alias].settings_dict['NAME']
+    primary = connections[DEFAULT_DB_ALIAS].settings_dict['NAME']
+    if name == primary or not os.path.exists(name):
+        return False
+    snapshot = cache.get(SNAPSHOT_KEY.format(alias)) or {}
+    synced = snapshot.get('synced', 0)
+    return time.time() - synced < settings.REPLICA_MAX_LAG
+
+
+def choose_replica(request) -> str:
+    """Реплика для запроса или None, если читать надо с основной базы."""
+    if settings.REPLICA_STICKY_COOKIE in request.COOKIES:
+        return None
+    replicas = [
+        alias for alias in settings.DATABASE_REPLICAS if available(alias)
+    ]
+    return random.choice(replicas) if replicas else None
+
+
+def read_replica(view):
+    """Декоратор представления только для чтения."""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        token = _read_alias.set(choose_replica(request))
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _read_alias.reset(token)
+
+    return wrapper
+
+
+def current_replica() -> str:
+    """Реплика, с которой читает текущий запрос, или None."""
+    return _read_alias.get()
+
+
+def use_primary() -> None:
+    """Переводит остаток запроса на чтение с основной базы."""
+    _read_alias.set(None)
+
+
+def track_writes() -> list:
+    """Начинает учёт записей запроса; список пополняет роутер."""
+    writes = []
+    _wrote.set(writes)
+    return writes
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        writes = _wrote.get()
+        untracked = model._meta.app_label in settings.REPLICA_UNTRACKED_APPS
+        if writes is not None and not untracked:
+            writes.append(model._meta.label)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,49 @@
+"""Запуск тестов с собственным файлом общего кеша."""
+import os
+import shutil
+import tempfile
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+@contextmanager
+def isolated_cache():
+    """Переносит общий кеш во временный каталог и удаляет его на выходе.
+
+    Иначе тесты чистили бы кеш запущенного сервера и видели бы записи
+    прошлых прогонов.
+    """
+    directory = tempfile.mkdtemp(prefix='yatube-cache-')
+    caches = {
+        **settings.CACHES,
+        'shared': {
+            **settings.CACHES['shared'],
+            'LOCATION': os.path.join(directory, 'cache.sqlite3'),
+        },
+    }
+    try:
+        with override_settings(CACHES=caches):
+            yield
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class TestRunner(DiscoverRunner):
+    """DiscoverRunner, который держит общий кеш тестов отдельно.
+
+    Миниатюры в тестах строятся без фоновых потоков, как и в pytest:
+    тесты удаляют временный MEDIA_ROOT, пока поток мог бы в него писать.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._stack = ExitStack()
+        self._stack.enter_context(isolated_cache())
+        self._stack.enter_context(override_settings(THUMBNAIL_WORKERS=0))
+
+    def teardown_test_environment(self, **kwargs):
+        self._stack.close()
+        super().teardown_test_environment(**kwargs)
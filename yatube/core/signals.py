@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# sync_replica отправляет его перед тем, как скопировать основную базу
+# в реплику ``alias``: всё, что записано к этому моменту, в копию попадёт.
+replica_sync_started = Signal(providing_args=['alias'])
@@ -0,0 +1,49 @@
+"""Потоковая отдача страниц: шапка уходит клиенту до выборки тела."""
+from contextvars import Context, copy_context
+from itertools import chain
+
+from django.http import HttpRequest, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+SLOT = '<!-- stream -->'
+
+
+def _in_context(context: Context, chunks):
+    """Выполняет итератор в contextvars представления.
+
+    Тело читается уже после выхода из представления и middleware, а
+    роутер реплики и профилирование хранят своё состояние в contextvars.
+    """
+    while True:
+        try:
+            yield context.run(next, chunks)
+        except StopIteration:
+            return
+
+
+def stream(chunks) -> StreamingHttpResponse:
+    """Ответ из итератора HTML-кусков, выполняемого в контексте запроса.
+
+    Контекст копируется здесь, пока представление ещё работает: тело
+    генератора запустится только на первом ``next``, когда read_replica
+    и ProfilingMiddleware уже сбросят свои contextvars.
+    """
+    return StreamingHttpResponse(_in_context(copy_context(), iter(chunks)))
+
+
+def stream_render(request: HttpRequest, template_name: str, context: dict,
+                  chunks) -> StreamingHttpResponse:
+    """Отдаёт шаблон по частям вместо ``render``.
+
+    Шаблон выводит ``{{ stream }}`` там, где должно быть тело. Всё до
+    этого места рендерится сразу и уходит первым куском, затем идут
+    строки из итератора ``chunks``, затем остаток шаблона. Итератор
+    вызывается лениво, поэтому запросы за телом выполняются, когда шапка
+    уже отправлена, а в памяти одновременно лежит только один кусок.
+    """
+    page = render_to_string(
+        template_name, {**context, 'stream': mark_safe(SLOT)}, request
+    )
+    head, tail = page.split(SLOT, 1)
+    return stream(chain([head], chunks, [tail]))
@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from ..cache import LocalTier, SQLiteCache, TwoTierCache
+
+CACHE_DIR = tempfile.mkdtemp()
+OPTIONS = {'MAX_ENTRIES': 2, 'LOCAL_TIMEOUT': 60, 'SYNC_INTERVAL': 0}
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(CACHE_DIR, 'cache.sqlite3'),
+    },
+})
+class TwoTierCacheTest(SimpleTestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        caches['shared'].clear()
+        # Два экземпляра со своими LRU изображают два процесса.
+        self.first = self.process()
+        self.second = self.process()
+
+    def process(self) -> TwoTierCache:
+        cache = TwoTierCache('shared', {'OPTIONS': OPTIONS})
+        cache.local = LocalTier(cache._max_entries)
+        return cache
+
+    def test_second_read_is_served_locally(self):
+        """Повторное чтение не доходит до общего кеша."""
+        self.first.set('key', 'value')
+        self.assertEqual(self.second.get('key'), 'value')
+        self.assertEqual(self.second.get('key'), 'value')
+        self.assertIsNone(self.second.get('missing'))
+        self.assertEqual(self.second.stats(), {
+            'local': {'hits': 1, 'misses': 2},
+            'shared': {'hits': 1, 'misses': 1},
+        })
+
+    def test_writes_invalidate_other_processes(self):
+        """Запись в одном процессе выбрасывает ключ из LRU другого."""
+        self.first.set('key', 'old')
+        self.first.add('counter', 1)
+        self.second.get_many(['key', 'counter'])
+        self.first.set('key', 'new')
+        self.first.incr('counter')
+        self.assertEqual(
+            self.second.get_many(['key', 'counter']),
+            {'key': 'new', 'counter': 2},
+        )
+        self.first.delete('key')
+        self.assertIsNone(self.second.get('key'))
+        self.first.clear()
+        self.assertIsNone(self.second.get('counter'))
+
+    def test_local_tier_is_bounded(self):
+        """LRU хранит не больше MAX_ENTRIES ключей."""
+        for key in ('a', 'b', 'c'):
+            self.first.set(key, key)
+        self.assertEqual(len(self.first.local.entries), 2)
+        self.assertEqual(self.first.get('a'), 'a')
+
+
+class SQLiteCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.cache = SQLiteCache(
+            os.path.join(directory, 'cache.sqlite3'), {}
+        )
+
+    def test_add_incr_and_expiry(self):
+        """add не перезаписывает живой ключ, incr требует ключа."""
+        self.assertTrue(self.cache.add('key', 1))
+        self.assertFalse(self.cache.add('key', 5))
+        self.assertEqual(self.cache.incr('key', 2), 3)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+        self.cache.set('expired', 1, timeout=-1)
+        self.assertFalse(self.cache.has_key('expired'))
+        self.assertTrue(self.cache.add('expired', 2))
+        self.assertEqual(
+            self.cache.get_many(['key', 'expired', 'missing']),
+            {'key': 3, 'expired': 2},
+        )
@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import OperationalError, connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+
+from .. import db
+
+User = get_user_model()
+
+
+class SQLitePragmasTest(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.wrapper = DatabaseWrapper({
+            **connection.settings_dict,
+            'NAME': os.path.join(self.directory, 'db.sqlite3'),
+        }, alias='pragmas')
+
+    def tearDown(self):
+        self.wrapper.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def pragma(self, name: str):
+        with self.wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_new_connection_gets_pragmas(self):
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('cache_size'), -64 * 1024)
+
+    @override_settings(SQLITE_PRAGMAS={})
+    def test_empty_profile_keeps_sqlite_defaults(self):
+        self.assertEqual(self.pragma('journal_mode'), 'delete')
+        self.assertEqual(self.pragma('synchronous'), 2)
+
+
+@override_settings(WRITE_RETRIES=2, WRITE_BACKOFF=0.01)
+class ImmediateTest(TransactionTestCase):
+
+    def locked(self, times: int):
+        """Первые ``times`` попыток BEGIN IMMEDIATE упираются в блокировку."""
+        calls = []
+        begin = db._begin_immediate
+
+        def begin_immediate(connection):
+            calls.append(connection)
+            if len(calls) <= times:
+                raise OperationalError('database is locked')
+            begin(connection)
+
+        return mock.patch.object(db, '_begin_immediate', begin_immediate)
+
+    def test_retries_until_lock_is_taken(self):
+        before = db.stats()
+        with self.locked(2), mock.patch.object(db.time, 'sleep') as sleep:
+            with db.immediate():
+                self.assertTrue(connection.in_atomic_block)
+                User.objects.create_user(username='writer')
+        self.assertEqual(sleep.call_count, 2)
+        self.assertTrue(User.objects.filter(username='writer').exists())
+        after = db.stats()
+        self.assertEqual(after['transactions'] - before['transactions'], 1)
+        self.assertEqual(after['retries'] - before['retries'], 2)
+        self.assertFalse(connection.in_atomic_block)
+
+    def test_gives_up_after_retries(self):
+        before = db.stats()
+        with self.locked(3), mock.patch.object(db.time, 'sleep'):
+            with self.assertRaises(OperationalError):
+                with db.immediate():
+                    User.objects.create_user(username='writer')
+        self.assertFalse(User.objects.exists())
+        self.assertEqual(db.stats()['failures'] - before['failures'], 1)
+
+    def test_error_rolls_back(self):
+        with self.assertRaises(ValueError):
+            with db.immediate():
+                User.objects.create_user(username='writer')
+                raise ValueError
+        self.assertFalse(User.objects.exists())
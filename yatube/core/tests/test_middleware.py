@@ -0,0 +1,72 @@
+import json
+import re
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+class ProfilingMiddlewareTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.user = User.objects.create_user(username='user')
+
+    def test_staff_header_adds_server_timing(self):
+        """Сотрудник с заголовком получает Server-Timing и строку журнала."""
+        self.client.force_login(self.staff)
+        with self.assertLogs('core.middleware', 'INFO') as logs:
+            response = self.client.get(
+                reverse('posts:index'), HTTP_X_PROFILE='1'
+            )
+        timing = response['Server-Timing']
+        for metric in ('sql;dur=', 'template;dur=', 'total;dur='):
+            self.assertIn(metric, timing)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['path'], reverse('posts:index'))
+        self.assertGreater(record['sql_count'], 0)
+        self.assertIn('local', record['cache'])
+
+    def test_streamed_body_is_profiled(self):
+        """SQL тела потоковой страницы попадает в журнал, который
+        пишется, когда тело отдано."""
+        post = Post.objects.create(author=self.user, text='Пост')
+        Comment.objects.create(post=post, author=self.user, text='Ок')
+        self.client.force_login(self.staff)
+        with self.assertLogs('core.middleware', 'INFO') as logs:
+            response = self.client.get(
+                reverse('posts:post_detail', args=(post.pk,)),
+                HTTP_X_PROFILE='1',
+            )
+            self.assertEqual(logs.records, [])
+            content = b''.join(response.streaming_content).decode()
+        self.assertIn('Ок', content)
+        head = int(re.search(
+            r'sql;[^,]*desc="(\d+) queries"', response['Server-Timing']
+        ).group(1))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertGreater(record['sql_count'], head)
+
+    def test_header_is_ignored_for_other_users(self):
+        """Обычный пользователь не может включить профилирование."""
+        self.client.force_login(self.user)
+        with mock.patch('core.middleware.logger.info') as log:
+            response = self.client.get(
+                reverse('posts:index'), HTTP_X_PROFILE='1'
+            )
+        log.assert_not_called()
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    @override_settings(PROFILING_SAMPLE_RATE=1.0)
+    def test_sampled_requests_are_only_logged(self):
+        """Выборочные запросы пишутся в журнал без заголовка."""
+        with self.assertLogs('core.middleware', 'INFO'):
+            response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
@@ -0,0 +1,192 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory, SimpleTestCase, TestCase, TransactionTestCase,
+)
+from django.urls import reverse
+from sorl.thumbnail.models import KVStore
+
+from .. import routers
+from ..signals import replica_sync_started
+from ..streaming import stream
+from posts import cache as generations
+from posts import freshness
+from posts.models import Post
+
+User = get_user_model()
+
+
+class ReplicaRouterTest(SimpleTestCase):
+
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+
+        @routers.read_replica
+        def view(request):
+            return HttpResponse(self.router.db_for_read(Post))
+
+        self.view = view
+        self.factory = RequestFactory()
+
+    def test_decorated_view_reads_from_replica(self):
+        with mock.patch.object(routers, 'available', return_value=True):
+            response = self.view(self.factory.get('/'))
+        self.assertEqual(response.content, b'replica')
+        self.assertIsNone(self.router.db_for_read(Post))
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+
+    def test_streamed_body_reads_through_replica(self):
+        """Тело потокового ответа читается уже после выхода из
+        представления, но с той же реплики."""
+
+        @routers.read_replica
+        def view(request):
+            return stream(
+                self.router.db_for_read(Post) for _ in range(2)
+            )
+
+        with mock.patch.object(routers, 'available', return_value=True):
+            response = view(self.factory.get('/'))
+        self.assertIsNone(self.router.db_for_read(Post))
+        self.assertEqual(b''.join(response.streaming_content),
+                         b'replicareplica')
+
+    def test_sticky_cookie_keeps_reads_on_primary(self):
+        request = self.factory.get('/')
+        request.COOKIES['primary'] = '1'
+        with mock.patch.object(routers, 'available', return_value=True):
+            response = self.view(request)
+        self.assertEqual(response.content, b'None')
+
+    def test_mirror_replica_is_not_used(self):
+        """В тестах реплика — зеркало default, и чтение остаётся там."""
+        self.assertFalse(routers.available('replica'))
+        self.assertEqual(self.view(self.factory.get('/')).content, b'None')
+
+
+class ReplicaGenerationTest(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+        @routers.read_replica
+        def view(request):
+            return HttpResponse(freshness.index_etag(request))
+
+        self.view = view
+
+    def request(self, **cookies):
+        request = self.factory.get('/')
+        request.user = AnonymousUser()
+        request.COOKIES.update(cookies)
+        return request
+
+    def test_replica_reads_use_generation_of_last_sync(self):
+        """После записи читатель реплики получает ETag её копии,
+        а читатель основной базы — новый."""
+        replica_sync_started.send(sender=None, alias='replica')
+        synced = generations.generation('posts')
+        cards = generations.generation('cards')
+        generations.bump('posts')
+        with mock.patch.object(routers, 'available', return_value=True):
+            replica = self.view(self.request())
+            primary = self.view(self.request(primary='1'))
+        self.assertEqual(replica.content.decode(), f'{synced}-{cards}-0')
+        self.assertEqual(
+            primary.content.decode(), f'{synced + 1}-{cards}-0'
+        )
+
+    def test_missing_snapshot_moves_request_to_primary(self):
+        """Без снимка свежесть реплики неизвестна, и запрос уходит
+        на основную базу."""
+
+        @routers.read_replica
+        def view(request):
+            value = generations.generation('posts')
+            return HttpResponse(f'{value} {routers.current_replica()}')
+
+        with mock.patch.object(routers, 'available', return_value=True):
+            response = view(self.factory.get('/'))
+        self.assertEqual(
+            response.content.decode(),
+            f'{generations.generation("posts")} None',
+        )
+
+
+class ReplicaMiddlewareTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='writer')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_reads_do_not_stick(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn('primary', response.cookies)
+
+    def test_thumbnail_store_writes_do_not_stick(self):
+        """Запись sorl о построенной миниатюре не закрепляет читателя."""
+        writes = routers.track_writes()
+        routers.ReplicaRouter().db_for_write(KVStore)
+        routers.ReplicaRouter().db_for_write(Post)
+        self.assertEqual(writes, ['posts.Post'])
+
+    def test_write_sticks_to_primary(self):
+        response = self.client.post(
+            reverse('posts:add_comment', args=(self.post.pk,)),
+            {'text': 'Коммент'},
+        )
+        cookie = response.cookies['primary']
+        self.assertEqual(cookie['max-age'], 15)
+
+
+class SyncReplicaTest(TransactionTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.name = os.path.join(self.directory, 'replica.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_copies_primary_into_replica_file(self):
+        User.objects.create_user(username='copied')
+        settings_dict = connections['replica'].settings_dict
+        with mock.patch.dict(settings_dict, {'NAME': self.name}):
+            self.assertFalse(routers.available('replica'))
+            call_command('sync_replica', stdout=StringIO())
+            self.assertTrue(routers.available('replica'))
+        replica = sqlite3.connect(self.name)
+        try:
+            rows = replica.execute(
+                'SELECT username FROM auth_user'
+            ).fetchall()
+        finally:
+            replica.close()
+        self.assertEqual(rows, [('copied',)])
+
+    def test_stale_replica_is_not_used(self):
+        """Реплику, которую давно не копировали, запросы обходят."""
+        settings_dict = connections['replica'].settings_dict
+        with mock.patch.dict(settings_dict, {'NAME': self.name}):
+            call_command('sync_replica', stdout=StringIO())
+            synced = cache.get(routers.SNAPSHOT_KEY.format('replica'))
+            with self.settings(REPLICA_MAX_LAG=15), mock.patch.object(
+                routers.time, 'time', return_value=synced['synced'] + 16
+            ):
+                self.assertFalse(routers.available('replica'))
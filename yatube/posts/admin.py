@@ -1,5 +1,9 @@
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
+from django.urls import path
 
+from . import export, search
 from .models import Group, Post, Comment, Follow
 
 
@@ -16,6 +20,48 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search.enabled() or not search_term:
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        return search.filter_posts(queryset, search_term), False
+
+    def get_urls(self):
+        urls = [
+            path(
+                'export/',
+                self.admin_site.admin_view(self.export_view),
+                name='posts_post_export',
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def export_view(self, request):
+        """Потоковая выгрузка ``?kind=post&format=csv&gzip=1``."""
+        if not request.user.is_superuser:
+            raise PermissionDenied
+        kinds = request.GET.getlist('kind') or list(export.EXPORTS)
+        output_format = request.GET.get('format', 'jsonl')
+        compress = 'gzip' in request.GET
+        try:
+            chunks = export.stream(kinds, output_format, compress)
+        except ValueError as error:
+            return HttpResponseBadRequest(str(error))
+        filename = f'yatube-{"-".join(kinds)}.{output_format}'
+        if compress:
+            content_type = 'application/gzip'
+            filename += '.gz'
+        elif output_format == 'csv':
+            content_type = 'text/csv; charset=utf-8'
+        else:
+            content_type = 'application/x-ndjson; charset=utf-8'
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        response['Content-Disposition'] = (
+            f'attachment; filename="{filename}"'
+        )
+        return response
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = (
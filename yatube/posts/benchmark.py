@@ -0,0 +1,164 @@
+"""Нагрузочный замер горячих представлений на синтетических данных."""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from .models import Group, Post, Profile, User
+
+VIEWS = (
+    'index', 'group_posts', 'profile', 'post_detail', 'follow_index',
+    'add_comment', 'read_write',
+)
+COMMENT = {'text': 'Коммент замера'}
+PROFILES = ('tuned', 'plain')
+
+
+@contextmanager
+def database_profile(name: str):
+    """Профиль базы для замера: tuned — как в настройках, plain — без них.
+
+    plain повторяет исходную конфигурацию: журнал DELETE без прагм и новое
+    соединение на каждый запрос. Входить нужно до создания базы, иначе
+    режим WAL уже будет записан в файл.
+    """
+    if name == 'tuned':
+        yield
+        return
+    settings_dict = connection.settings_dict
+    max_age = settings_dict['CONN_MAX_AGE']
+    settings_dict['CONN_MAX_AGE'] = 0
+    try:
+        with override_settings(SQLITE_PRAGMAS={}):
+            yield
+    finally:
+        settings_dict['CONN_MAX_AGE'] = max_age
+
+
+def seed(posts: int, seed: int = 0) -> None:
+    """Заполняет базу командой ``seed``: при том же seed данные те же."""
+    call_command('seed', posts=posts, seed=seed, stdout=StringIO())
+
+
+def targets() -> tuple:
+    """Читатель и адреса самых нагруженных страниц засеянной базы.
+
+    Читатель — пользователь с наибольшим числом подписок, пост — самый
+    обсуждаемый, группа и автор — с наибольшим числом постов. Каждому
+    представлению соответствует список запросов, которые поток повторяет
+    по кругу; read_write смешивает чтение с записью комментариев, чтобы
+    было видно, как писатель задерживает читателей.
+    """
+    reader = Profile.objects.order_by('-following_count', 'pk').values_list(
+        'user__username', flat=True
+    ).first()
+    author = Profile.objects.order_by('-posts_count', 'pk').values_list(
+        'user__username', flat=True
+    ).first()
+    group = Group.objects.order_by('-posts_count', 'pk').values_list(
+        'slug', flat=True
+    ).first()
+    post = Post.objects.order_by('-comments_count', 'pk').values_list(
+        'pk', flat=True
+    ).first()
+    requests = {
+        'index': ('get', reverse('posts:index')),
+        'group_posts': ('get', reverse('posts:group_list', args=(group,))),
+        'profile': ('get', reverse('posts:profile', args=(author,))),
+        'post_detail': ('get', reverse('posts:post_detail', args=(post,))),
+        'follow_index': ('get', reverse('posts:follow_index')),
+        'add_comment': ('post', reverse('posts:add_comment', args=(post,))),
+    }
+    targets = {view: [request] for view, request in requests.items()}
+    targets['read_write'] = [
+        requests[view]
+        for view in ('index', 'post_detail', 'profile', 'add_comment')
+    ]
+    return reader, targets
+
+
+def percentile(timings: list, share: float) -> float:
+    """Перцентиль отсортированного списка с линейной интерполяцией."""
+    position = (len(timings) - 1) * share
+    lower = int(position)
+    upper = min(lower + 1, len(timings) - 1)
+    return timings[lower] + (
+        (timings[upper] - timings[lower]) * (position - lower)
+    )
+
+
+def _worker(reader: str, target: list, count: int, offset: int) -> list:
+    client = Client()
+    client.force_login(User.objects.get(username=reader))
+    timings = []
+    try:
+        for number in range(offset, offset + count):
+            method, url = target[number % len(target)]
+            data = COMMENT if method == 'post' else None
+            started = time.perf_counter()
+            response = getattr(client, method)(url, data)
+            if response.streaming:
+                # Потоковое тело рендерится только при чтении, и без него
+                # замер показал бы одну шапку страницы.
+                b''.join(response.streaming_content)
+            timings.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                raise RuntimeError(f'{url}: ответ {response.status_code}')
+    finally:
+        connections.close_all()
+    return timings
+
+
+def measure(reader: str, target: list, requests: int, workers: int) -> dict:
+    """Гоняет ``requests`` запросов читателя в ``workers`` потоков.
+
+    Возвращает запросы в секунду и перцентили задержки в миллисекундах.
+    """
+    shares = [requests // workers + (i < requests % workers)
+              for i in range(workers)]
+    started = time.perf_counter()
+    if workers == 1:
+        timings = _worker(reader, target, requests, 0)
+    else:
+        with ThreadPoolExecutor(workers) as pool:
+            parts = pool.map(
+                _worker, [reader] * workers, [target] * workers, shares,
+                range(workers),
+            )
+            timings = [timing for part in parts for timing in part]
+    elapsed = time.perf_counter() - started
+    timings.sort()
+    return {
+        'requests': len(timings),
+        'rps': round(len(timings) / elapsed, 1),
+        'p50_ms': round(percentile(timings, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(timings, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(timings, 0.99) * 1000, 2),
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list:
+    """Регрессии против baseline: просевший rps или выросший p95."""
+    regressions = []
+    for size, views in result.items():
+        for view, current in views.items():
+            reference = baseline.get(size, {}).get(view)
+            if reference is None:
+                continue
+            if current['rps'] < reference['rps'] * (1 - tolerance):
+                regressions.append(
+                    f'{size}/{view}: rps {current["rps"]} '
+                    f'вместо {reference["rps"]}'
+                )
+            if current['p95_ms'] > reference['p95_ms'] * (1 + tolerance):
+                regressions.append(
+                    f'{size}/{view}: p95 {current["p95_ms"]} мс '
+                    f'вместо {reference["p95_ms"]} мс'
+                )
+    return regressions
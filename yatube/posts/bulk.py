@@ -0,0 +1,30 @@
+"""Общие шаги массовой записи в обход сигналов: import_yatube и seed."""
+from contextlib import contextmanager
+
+from . import cache, counters, search, timeline
+from .models import Comment, Post
+
+
+@contextmanager
+def source_dates():
+    """Не даёт auto_now_add затереть заданные заранее даты публикации."""
+    fields = [model._meta.get_field('pub_date') for model in (Post, Comment)]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def rebuild() -> None:
+    """Восстанавливает то, что при обычном сохранении делают сигналы.
+
+    ``bulk_create`` не отправляет сигналы, поэтому профили, счётчики,
+    ленты подписок и поисковый индекс пересчитываются здесь разом.
+    """
+    counters.recount()
+    timeline.rebuild()
+    search.rebuild()
+    cache.bump('posts')
@@ -0,0 +1,55 @@
+import time
+
+from django.core.cache import cache
+
+from core import routers
+
+GENERATION_KEY = 'generation:{}'
+REPLICA_KEY = routers.SNAPSHOT_KEY
+GENERATIONS = ('posts', 'comments', 'follows', 'cards')
+
+
+def generation(name: str) -> int:
+    """Текущее поколение данных с именем ``name``.
+
+    Поколение входит в ключи кеша, поэтому его увеличение сразу делает
+    недействительными все фрагменты, собранные по старым данным. Если
+    счётчик вытеснен из кеша, он начинается заново с текущего времени,
+    чтобы не совпасть со старыми ключами.
+
+    Запрос, читающий с реплики, получает поколение, снятое перед её
+    последним копированием: иначе старые данные реплики легли бы в кеш
+    и в ETag под новым поколением. Если снимка нет, запрос переходит
+    на основную базу.
+    """
+    alias = routers.current_replica()
+    if alias is not None:
+        snapshot = cache.get(REPLICA_KEY.format(alias)) or {}
+        if name in snapshot:
+            return snapshot[name]
+        routers.use_primary()
+    key = GENERATION_KEY.format(name)
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, time.time_ns(), None)
+        value = cache.get(key)
+    return value
+
+
+def bump(name: str) -> None:
+    """Начинает новое поколение данных с именем ``name``."""
+    try:
+        cache.incr(GENERATION_KEY.format(name))
+    except ValueError:
+        generation(name)
+
+
+def snapshot(alias: str) -> None:
+    """Запоминает поколения, которые будут у реплики ``alias``,
+    и время копирования.
+
+    Вызывается до копирования, поэтому данные реплики не старше снимка.
+    """
+    values = {name: generation(name) for name in GENERATIONS}
+    values['synced'] = time.time()
+    cache.set(REPLICA_KEY.format(alias), values, None)
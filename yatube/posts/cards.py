@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.core.cache import cache as django_cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from . import cache, thumbnails
+from .models import Post
+
+CARD_KEY = 'post_card:{}:{}:{}'
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+
+
+def card_key(post: Post, generation: int) -> str:
+    """Ключ карточки: правка поста меняет ``updated`` и сам ключ.
+
+    Поколение ``cards`` сбрасывает все карточки сразу, когда меняются
+    данные вне поста: группа или имя автора.
+    """
+    stamp = int(post.updated.timestamp() * 1_000_000)
+    return CARD_KEY.format(generation, post.pk, stamp)
+
+
+def attach(posts) -> None:
+    """Проставляет постам ``card`` — готовую разметку карточки.
+
+    Карточки всей страницы читаются одним get_many; отрисовываются
+    и кладутся в кеш только недостающие, и только для них ищутся
+    миниатюры. Карточка с заглушкой вместо ещё не построенной миниатюры
+    в кеш не попадает.
+    """
+    generation = cache.generation('cards')
+    keys = {card_key(post, generation): post for post in posts}
+    found = django_cache.get_many(list(keys))
+    missing = {key: post for key, post in keys.items() if key not in found}
+    thumbnails.attach(missing.values())
+    rendered = {
+        key: render_to_string(CARD_TEMPLATE, {'post': post})
+        for key, post in missing.items()
+    }
+    ready = {
+        key: card for key, card in rendered.items()
+        if missing[key].thumbnail or not missing[key].image
+    }
+    if ready:
+        django_cache.set_many(ready, settings.CARD_CACHE_TIMEOUT)
+    for key, post in keys.items():
+        post.card = mark_safe(found.get(key) or rendered[key])
+
+
+def forget(post: Post) -> None:
+    django_cache.delete(card_key(post, cache.generation('cards')))
@@ -0,0 +1,72 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, Profile, User
+
+BATCH_SIZE = 500
+
+
+def change(queryset, field: str, delta: int) -> None:
+    """Атомарно сдвигает счётчик в базе, не уходя ниже нуля."""
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def post_added(post: Post, delta: int = 1) -> None:
+    change(Profile.objects.filter(user_id=post.author_id),
+           'posts_count', delta)
+    if post.group_id is not None:
+        change(Group.objects.filter(pk=post.group_id), 'posts_count', delta)
+
+
+def post_moved(post: Post, author_id: int, group_id: int) -> None:
+    """Переносит пост в счётчиках прежних автора и группы в новые."""
+    if author_id != post.author_id:
+        change(Profile.objects.filter(user_id=author_id), 'posts_count', -1)
+        change(Profile.objects.filter(user_id=post.author_id),
+               'posts_count', 1)
+    if group_id != post.group_id:
+        if group_id is not None:
+            change(Group.objects.filter(pk=group_id), 'posts_count', -1)
+        if post.group_id is not None:
+            change(Group.objects.filter(pk=post.group_id), 'posts_count', 1)
+
+
+def comment_added(comment: Comment, delta: int = 1) -> None:
+    change(Post.objects.filter(pk=comment.post_id), 'comments_count', delta)
+
+
+def follow_added(follow: Follow, delta: int = 1) -> None:
+    change(Profile.objects.filter(user_id=follow.author_id),
+           'followers_count', delta)
+    change(Profile.objects.filter(user_id=follow.user_id),
+           'following_count', delta)
+
+
+def _count(model, field: str) -> Coalesce:
+    rows = model.objects.filter(
+        **{field: OuterRef('pk')}
+    ).order_by().values(field).annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+def recount() -> None:
+    """Пересчитывает все счётчики по исходным таблицам.
+
+    Заодно создаёт профили пользователям, у которых их нет.
+    """
+    missing = User.objects.filter(
+        profile__isnull=True
+    ).values_list('pk', flat=True)
+    Profile.objects.bulk_create(
+        [Profile(user_id=pk) for pk in missing],
+        batch_size=BATCH_SIZE,
+    )
+    Profile.objects.update(
+        posts_count=_count(Post, 'author'),
+        followers_count=_count(Follow, 'author'),
+        following_count=_count(Follow, 'user'),
+    )
+    Post.objects.update(comments_count=_count(Comment, 'post'))
+    Group.objects.update(posts_count=_count(Post, 'group'))
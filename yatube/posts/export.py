@@ -0,0 +1,112 @@
+import csv
+import zlib
+from typing import Iterable, Iterator
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Comment, Follow, Post
+
+CHUNK_SIZE = 2000
+BLOCK_SIZE = 64 * 1024
+FORMATS = ('jsonl', 'csv')
+
+# Поля выгрузки совпадают с записями команды import_yatube, поэтому
+# выгрузку в JSONL можно загрузить обратно.
+EXPORTS = {
+    'post': (Post, {
+        'id': 'pk',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'image': 'image',
+    }),
+    'comment': (Comment, {
+        'post': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+        'pub_date': 'pub_date',
+    }),
+    'follow': (Follow, {
+        'user': 'user__username',
+        'author': 'author__username',
+    }),
+}
+
+
+def rows(kind: str) -> Iterator[tuple]:
+    """Строки таблицы кусками по CHUNK_SIZE, без моделей и кеша queryset."""
+    model, columns = EXPORTS[kind]
+    return model.objects.order_by('pk').values_list(
+        *columns.values()
+    ).iterator(chunk_size=CHUNK_SIZE)
+
+
+def jsonl(kinds: Iterable[str]) -> Iterator[str]:
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for kind in kinds:
+        keys = list(EXPORTS[kind][1])
+        for row in rows(kind):
+            record = {'type': kind, **dict(zip(keys, row))}
+            yield encoder.encode(record) + '\n'
+
+
+class Echo:
+    """Файл, который возвращает записанную строку вместо записи."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def csv_lines(kind: str) -> Iterator[str]:
+    writer = csv.writer(Echo())
+    yield writer.writerow(list(EXPORTS[kind][1]))
+    for row in rows(kind):
+        yield writer.writerow(row)
+
+
+def blocks(lines: Iterable[str]) -> Iterator[bytes]:
+    """Склеивает строки в блоки примерно по BLOCK_SIZE байт."""
+    block = []
+    size = 0
+    for line in lines:
+        data = line.encode()
+        block.append(data)
+        size += len(data)
+        if size >= BLOCK_SIZE:
+            yield b''.join(block)
+            block = []
+            size = 0
+    if block:
+        yield b''.join(block)
+
+
+def gzipped(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream(kinds: list, format: str = 'jsonl',
+           compress: bool = False) -> Iterator[bytes]:
+    """Выгрузка ``kinds`` в виде потока байтов.
+
+    Память не растёт вместе с таблицей: строки читаются из базы кусками
+    и сразу уходят дальше. CSV выгружает только одну таблицу за раз.
+    """
+    unknown = set(kinds) - set(EXPORTS)
+    if unknown:
+        raise ValueError(f'Неизвестные таблицы: {", ".join(sorted(unknown))}')
+    if format not in FORMATS:
+        raise ValueError(f'Неизвестный формат: {format}')
+    if format == 'csv':
+        if len(kinds) != 1:
+            raise ValueError('CSV выгружает ровно одну таблицу.')
+        lines = csv_lines(kinds[0])
+    else:
+        lines = jsonl(kinds)
+    chunks = blocks(lines)
+    return gzipped(chunks) if compress else chunks
@@ -0,0 +1,155 @@
+import json
+
+from django.conf import settings
+from django.core.cache import cache as django_cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, HttpRequest, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed
+from django.utils.text import Truncator
+
+from . import cache
+from .models import Group, Post, User
+
+GENERATORS = {'rss': Rss201rev2Feed, 'atom': Atom1Feed}
+CONTENT_TYPES = {
+    'rss': 'application/rss+xml; charset=utf-8',
+    'atom': 'application/atom+xml; charset=utf-8',
+    'json': 'application/feed+json; charset=utf-8',
+}
+FEED_KEY = 'feed:{}:{}:{}{}'
+FIELDS = (
+    'pk', 'text', 'pub_date', 'updated', 'author__username',
+    'author__first_name', 'author__last_name', 'group__title',
+)
+
+
+def etag(request: HttpRequest, *args, **kwargs) -> str:
+    """Лента меняется вместе с постами или именами авторов и групп."""
+    return f"{cache.generation('posts')}-{cache.generation('cards')}"
+
+
+def index_channel() -> dict:
+    return {
+        'title': 'Yatube: последние обновления',
+        'description': 'Свежие посты всех авторов.',
+        'link': reverse('posts:index'),
+        'posts': Post.objects.all(),
+    }
+
+
+def group_channel(slug: str) -> dict:
+    group = get_object_or_404(
+        Group.objects.values('pk', 'title', 'description'), slug=slug
+    )
+    return {
+        'title': f'Yatube: {group["title"]}',
+        'description': group['description'],
+        'link': reverse('posts:group_list', args=(slug,)),
+        'posts': Post.objects.filter(group_id=group['pk']),
+    }
+
+
+def profile_channel(username: str) -> dict:
+    author = get_object_or_404(
+        User.objects.values('pk'), username=username
+    )
+    return {
+        'title': f'Yatube: посты {username}',
+        'description': f'Посты пользователя {username}.',
+        'link': reverse('posts:profile', args=(username,)),
+        'posts': Post.objects.filter(author_id=author['pk']),
+    }
+
+
+def entries(request: HttpRequest, posts) -> list:
+    rows = posts.order_by('-pub_date', '-pk').values(*FIELDS)
+    result = []
+    for row in rows[:settings.FEED_SIZE]:
+        name = ' '.join(filter(None, (
+            row['author__first_name'], row['author__last_name']
+        )))
+        result.append({
+            'url': request.build_absolute_uri(
+                reverse('posts:post_detail', args=(row['pk'],))
+            ),
+            'title': Truncator(row['text']).chars(60),
+            'text': row['text'],
+            'published': row['pub_date'],
+            'updated': row['updated'],
+            'author': name or row['author__username'],
+            'group': row['group__title'],
+        })
+    return result
+
+
+def serialize(request: HttpRequest, fmt: str, channel: dict) -> bytes:
+    link = request.build_absolute_uri(channel['link'])
+    items = entries(request, channel['posts'])
+    if fmt == 'json':
+        return json.dumps({
+            'version': 'https://jsonfeed.org/version/1.1',
+            'title': channel['title'],
+            'description': channel['description'],
+            'home_page_url': link,
+            'feed_url': request.build_absolute_uri(),
+            'language': 'ru',
+            'items': [
+                {
+                    'id': item['url'],
+                    'url': item['url'],
+                    'title': item['title'],
+                    'content_text': item['text'],
+                    'date_published': item['published'],
+                    'date_modified': item['updated'],
+                    'authors': [{'name': item['author']}],
+                    'tags': [item['group']] if item['group'] else [],
+                }
+                for item in items
+            ],
+        }, cls=DjangoJSONEncoder, ensure_ascii=False).encode()
+    feed = GENERATORS[fmt](
+        title=channel['title'],
+        link=link,
+        description=channel['description'],
+        feed_url=request.build_absolute_uri(),
+        language='ru',
+    )
+    for item in items:
+        feed.add_item(
+            title=item['title'],
+            link=item['url'],
+            unique_id=item['url'],
+            description=item['text'],
+            pubdate=item['published'],
+            updateddate=item['updated'],
+            author_name=item['author'],
+            categories=[item['group']] if item['group'] else None,
+        )
+    return feed.writeString('utf-8').encode()
+
+
+def serve(request: HttpRequest, fmt: str, channel, *args) -> HttpResponse:
+    """Отдаёт ленту в формате ``fmt``, собранную ``channel(*args)``.
+
+    Готовое тело хранится в кеше до следующего поколения постов или
+    карточек, так что опрос ленты стоит одного обращения к кешу, а не
+    запроса и рендеринга.
+    """
+    if fmt not in CONTENT_TYPES:
+        raise Http404
+    key = FEED_KEY.format(
+        cache.generation('posts'), cache.generation('cards'),
+        request.get_host(), request.path,
+    )
+    body = django_cache.get(key)
+    if body is None:
+        body = serialize(request, fmt, channel(*args))
+        django_cache.set(key, body, settings.FEED_CACHE_TIMEOUT)
+    response = HttpResponse(body, content_type=CONTENT_TYPES[fmt])
+    patch_cache_control(
+        response, public=True, max_age=settings.FEED_MAX_AGE
+    )
+    return response
@@ -4,10 +4,26 @@ from .models import Comment, Post
 
 
 class PostForm(forms.ModelForm):
+    """Форма поста.
+
+    upload_errors — ошибки файлов, отброшенных ещё при загрузке
+    обработчиком ImageUploadLimitHandler.
+    """
+
+    def __init__(self, *args, upload_errors: dict = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.upload_errors = upload_errors or {}
+
     class Meta:
         model = Post
         fields = ('text', 'group', 'image')
 
+    def clean(self):
+        cleaned_data = super().clean()
+        for field, message in self.upload_errors.items():
+            self.add_error(field, message)
+        return cleaned_data
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
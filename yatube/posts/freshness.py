@@ -0,0 +1,77 @@
+"""Дешёвые проверки свежести страниц для условных GET-запросов.
+
+ETag собирается из поколений кеша, поэтому ловит правки, удаления и
+переименование автора или группы, и включает id пользователя там, где
+шапка и кнопки у всех разные.
+Last-Modified — время последней публикации в ленте или правки поста.
+Клиент, приславший ETag, сверяется по нему, а не по дате.
+"""
+from datetime import datetime
+
+from django.db.models import OuterRef, Subquery
+from django.http import HttpRequest
+
+from . import cache
+from .models import Comment, Post
+
+
+def _etag(*names: str, viewer: HttpRequest = None) -> str:
+    """ETag из поколений ``names`` и, если передан запрос, id зрителя."""
+    parts = [cache.generation(name) for name in names]
+    if viewer is not None:
+        parts.append(viewer.user.pk or 0)
+    return '-'.join(str(part) for part in parts)
+
+
+def _latest(queryset) -> datetime:
+    return queryset.order_by('-pub_date').values_list(
+        'pub_date', flat=True
+    ).first()
+
+
+def index_etag(request: HttpRequest) -> str:
+    return _etag('posts', 'cards', viewer=request)
+
+
+def index_last_modified(request: HttpRequest) -> datetime:
+    return _latest(Post.objects.all())
+
+
+def group_etag(request: HttpRequest, slug: str) -> str:
+    # Страница группы без шапки одинакова для всех пользователей.
+    return _etag('posts', 'cards')
+
+
+def group_last_modified(request: HttpRequest, slug: str) -> datetime:
+    return _latest(Post.objects.filter(group__slug=slug))
+
+
+def profile_etag(request: HttpRequest, username: str) -> str:
+    return _etag('posts', 'cards', 'follows', viewer=request)
+
+
+def profile_last_modified(request: HttpRequest,
+                          username: str) -> datetime:
+    return _latest(Post.objects.filter(author__username=username))
+
+
+def post_etag(request: HttpRequest, post_id: int) -> str:
+    return _etag('posts', 'cards', 'comments', viewer=request)
+
+
+def comments_etag(request: HttpRequest, post_id: int) -> str:
+    """Фрагмент комментариев не зависит от того, кто его смотрит."""
+    return _etag('posts', 'cards', 'comments')
+
+
+def post_last_modified(request: HttpRequest, post_id: int) -> datetime:
+    """Время правки поста или последнего комментария к нему."""
+    last_comment = Comment.objects.filter(
+        post=OuterRef('pk')
+    ).order_by('-pub_date').values('pub_date')[:1]
+    row = Post.objects.filter(pk=post_id).annotate(
+        last_comment=Subquery(last_comment)
+    ).values_list('updated', 'last_comment').first()
+    if row is None:
+        return None
+    return max(date for date in row if date is not None)
@@ -0,0 +1,138 @@
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import override_settings
+
+from posts import benchmark
+
+BASELINE = os.path.join(settings.BASE_DIR, 'benchmarks', 'baseline.json')
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет rps и задержку горячих представлений на 10k, 100k и 1M '
+        'постов во временной базе и сравнивает с сохранённым baseline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=[10000],
+            help='Размеры базы в постах, например 10000 100000 1000000.',
+        )
+        parser.add_argument(
+            '--views', nargs='+', default=list(benchmark.VIEWS),
+            help='Какие представления замерять.',
+        )
+        parser.add_argument(
+            '--profiles', nargs='+', choices=benchmark.PROFILES,
+            default=['tuned'],
+            help='Профили базы: tuned — WAL, прагмы и постоянные '
+                 'соединения из настроек, plain — без них. Результат plain '
+                 'попадает в отчёт под ключом «<размер>/plain».',
+        )
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument(
+            '--output', default='-',
+            help='Файл отчёта; «-» — стандартный вывод.',
+        )
+        parser.add_argument(
+            '--baseline', default=BASELINE,
+            help='Отчёт, с которым сравнивать результат.',
+        )
+        parser.add_argument(
+            '--save-baseline', action='store_true',
+            help='Записать результат как новый baseline.',
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.2,
+            help='Допустимая доля просадки rps и роста p95.',
+        )
+
+    def handle(self, *args, **options):
+        unknown = set(options['views']) - set(benchmark.VIEWS)
+        if unknown:
+            raise CommandError(f'Неизвестные представления: {unknown}')
+        if options['requests'] < options['workers'] or options['workers'] < 1:
+            raise CommandError('Нужно хотя бы по запросу на поток.')
+        result = {}
+        for size in options['sizes']:
+            for profile in options['profiles']:
+                key = str(size) if profile == 'tuned' else f'{size}/{profile}'
+                with benchmark.database_profile(profile):
+                    result[key] = self.run(size, options)
+        report = json.dumps(result, indent=2, ensure_ascii=False)
+        if options['output'] == '-':
+            self.stdout.write(report)
+        else:
+            with open(options['output'], 'w') as output:
+                output.write(report)
+        if options['save_baseline']:
+            os.makedirs(os.path.dirname(options['baseline']), exist_ok=True)
+            with open(options['baseline'], 'w') as output:
+                output.write(report)
+            return
+        self.check_baseline(result, options)
+
+    def run(self, size: int, options: dict) -> dict:
+        """Засеивает отдельную базу на ``size`` постов и замеряет её.
+
+        База и общий кеш живут во временном каталоге и удаляются после
+        замера, рабочая база не трогается. Реплики на время замера
+        указывают на ту же временную базу, поэтому роутер их не выбирает
+        и представления читают засеянные данные.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            caches = {
+                **settings.CACHES,
+                'shared': {
+                    **settings.CACHES['shared'],
+                    'LOCATION': os.path.join(directory, 'cache.sqlite3'),
+                },
+            }
+            test_settings = connection.settings_dict['TEST']
+            test_name = test_settings.get('NAME')
+            replicas = {
+                alias: connections[alias].settings_dict['NAME']
+                for alias in settings.DATABASE_REPLICAS
+            }
+            test_settings['NAME'] = os.path.join(directory, 'db.sqlite3')
+            old_name = connection.creation.create_test_db(
+                verbosity=0, autoclobber=True
+            )
+            for alias in replicas:
+                connections[alias].settings_dict['NAME'] = (
+                    connection.settings_dict['NAME']
+                )
+            try:
+                with override_settings(CACHES=caches):
+                    benchmark.seed(size)
+                    reader, targets = benchmark.targets()
+                    return {
+                        view: benchmark.measure(
+                            reader, targets[view], options['requests'],
+                            options['workers'],
+                        )
+                        for view in options['views']
+                    }
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                test_settings['NAME'] = test_name
+                for alias, name in replicas.items():
+                    connections[alias].settings_dict['NAME'] = name
+
+    def check_baseline(self, result: dict, options: dict) -> None:
+        if not os.path.exists(options['baseline']):
+            return
+        with open(options['baseline']) as baseline:
+            regressions = benchmark.compare(
+                result, json.load(baseline), options['tolerance']
+            )
+        if regressions:
+            raise CommandError(
+                'Регрессия производительности:\n' + '\n'.join(regressions)
+            )
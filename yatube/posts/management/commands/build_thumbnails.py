@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит миниатюры для всех картинок постов. Нужна после загрузки '
+        'данных в обход сигналов: до неё ленты показывают заглушки.'
+    )
+
+    def handle(self, *args, **options):
+        names = Post.objects.exclude(image='').values_list(
+            'image', flat=True
+        ).distinct()
+        count = 0
+        for name in names.iterator():
+            thumbnails.generate(name)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Миниатюры построены для {count} картинок.'
+        ))
@@ -0,0 +1,46 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково выгружает посты, комментарии и подписки в JSONL или CSV. '
+        'JSONL можно загрузить обратно командой import_yatube.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'kinds', nargs='*',
+            help='Что выгружать: post, comment, follow; по умолчанию всё.',
+        )
+        parser.add_argument(
+            '--format', choices=export.FORMATS, default='jsonl',
+        )
+        parser.add_argument(
+            '--gzip', action='store_true', help='Сжимать вывод.',
+        )
+        parser.add_argument(
+            '--output', default='-', help='Файл; «-» — стандартный вывод.',
+        )
+
+    def handle(self, *args, **options):
+        kinds = options['kinds'] or list(export.EXPORTS)
+        try:
+            chunks = export.stream(
+                kinds, options['format'], options['gzip']
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        if options['output'] == '-':
+            self.write(chunks, sys.stdout.buffer)
+            return
+        with open(options['output'], 'wb') as output:
+            self.write(chunks, output)
+
+    def write(self, chunks, output) -> None:
+        for chunk in chunks:
+            output.write(chunk)
+        output.flush()
@@ -0,0 +1,288 @@
+import json
+import os
+import time
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import bulk
+from posts.models import (
+    Comment, Follow, Group, ImportCheckpoint, Post, User,
+)
+
+# Порядок записи внутри порции: сначала то, на что ссылаются остальные.
+KINDS = ('user', 'group', 'post', 'comment', 'follow')
+REQUIRED = {
+    'user': ('username',),
+    'group': ('slug', 'title'),
+    'post': ('id', 'author', 'text'),
+    'comment': ('post', 'author', 'text'),
+    'follow': ('user', 'author'),
+}
+LOOKUP_SIZE = 500
+
+
+def parse_date(value: str):
+    if not value:
+        return timezone.now()
+    date = parse_datetime(value)
+    if date is None:
+        raise ValueError(f'Неверная дата: {value}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+def lookup(queryset, field: str, values) -> dict:
+    """Словарь ``значение поля -> pk`` для нужных значений.
+
+    Значения запрашиваются пачками, чтобы не упереться в предел числа
+    параметров запроса SQLite.
+    """
+    values = list(values)
+    found = {}
+    for start in range(0, len(values), LOOKUP_SIZE):
+        found.update(queryset.filter(**{
+            f'{field}__in': values[start:start + LOOKUP_SIZE]
+        }).values_list(field, 'pk'))
+    return found
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает пользователей, группы, посты, комментарии и подписки '
+        'из файла JSON Lines. Каждая строка — объект с полем "type": '
+        'user (username, first_name, last_name, email), '
+        'group (slug, title, description), '
+        'post (id, author, text, pub_date, group, image), '
+        'comment (post, author, text, pub_date), '
+        'follow (user, author). Незнакомые авторы создаются без пароля.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл JSON Lines.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Строк в одном INSERT.',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=20000,
+            help='Строк файла в одной транзакции.',
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Продолжить с последней записанной порции.',
+        )
+        parser.add_argument(
+            '--skip-rebuild', action='store_true',
+            help='Не пересчитывать счётчики, ленты, поиск и кеш в конце, '
+                 'например, если следом загружается ещё один файл.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        self.batch_size = options['batch_size']
+        self.checkpoint = os.path.abspath(path)
+        done = self.read_checkpoint() if options['resume'] else 0
+        self.users = {}
+        self.groups = {}
+        self.imported = dict.fromkeys(KINDS, 0)
+        self.skipped = 0
+        started = time.monotonic()
+        line_number = done
+        try:
+            stream = open(path, encoding='utf-8')
+        except OSError as error:
+            raise CommandError(error)
+        with stream, bulk.source_dates():
+            for _ in islice(stream, done):
+                pass
+            chunk = {kind: [] for kind in KINDS}
+            for line in stream:
+                line_number += 1
+                if line.strip():
+                    kind, record = self.parse(line, line_number)
+                    chunk[kind].append(record)
+                if line_number - done >= options['chunk_size']:
+                    self.write(chunk, line_number)
+                    done = line_number
+                    self.report(done, started)
+                    chunk = {kind: [] for kind in KINDS}
+            self.write(chunk, line_number)
+        self.report(line_number, started)
+        ImportCheckpoint.objects.filter(path=self.checkpoint).delete()
+        if not options['skip_rebuild']:
+            self.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            'Импорт завершён: ' + ', '.join(
+                f'{kind} {count}' for kind, count in self.imported.items()
+            ) + f', пропущено {self.skipped}.'
+        ))
+
+    def parse(self, line: str, line_number: int) -> tuple:
+        try:
+            record = json.loads(line)
+            kind = record.pop('type')
+        except (ValueError, KeyError, AttributeError, TypeError):
+            raise CommandError(f'Строка {line_number}: неверная запись.')
+        if kind not in KINDS:
+            raise CommandError(
+                f'Строка {line_number}: неизвестный тип «{kind}».'
+            )
+        missing = [key for key in REQUIRED[kind] if key not in record]
+        if missing:
+            raise CommandError(
+                f'Строка {line_number}: нет полей {", ".join(missing)}.'
+            )
+        if kind in ('post', 'comment'):
+            try:
+                record['pub_date'] = parse_date(record.get('pub_date'))
+            except (ValueError, TypeError) as error:
+                raise CommandError(f'Строка {line_number}: {error}')
+        return kind, record
+
+    def read_checkpoint(self) -> int:
+        return ImportCheckpoint.objects.filter(
+            path=self.checkpoint
+        ).values_list('done', flat=True).first() or 0
+
+    def report(self, done: int, started: float) -> None:
+        elapsed = time.monotonic() - started
+        rate = done / elapsed if elapsed else 0
+        self.stdout.write(f'Обработано строк: {done} ({rate:.0f} строк/с)')
+
+    def write(self, chunk: dict, done: int) -> None:
+        """Записывает порцию одной транзакцией в порядке зависимостей.
+
+        В той же транзакции запоминается номер последней строки порции.
+        """
+        with transaction.atomic():
+            self.write_users(chunk)
+            self.write_groups(chunk['group'])
+            self.write_posts(chunk['post'])
+            self.write_comments(chunk['comment'])
+            self.write_follows(chunk['follow'])
+            ImportCheckpoint.objects.update_or_create(
+                path=self.checkpoint, defaults={'done': done}
+            )
+
+    def bulk_create(self, kind: str, model, objects: list) -> None:
+        """Пишет строки, пропуская уже существующие.
+
+        Записанные строки считает сама база: rowcount каждого INSERT
+        не включает повторы, которые молча отбросил ignore_conflicts.
+        """
+        if not objects:
+            return
+        written = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal written
+            result = execute(sql, params, many, context)
+            written += max(context['cursor'].rowcount, 0)
+            return result
+
+        with connection.execute_wrapper(count):
+            model.objects.bulk_create(
+                objects, batch_size=self.batch_size, ignore_conflicts=True
+            )
+        self.imported[kind] += written
+        self.skipped += len(objects) - written
+
+    def write_users(self, chunk: dict) -> None:
+        records = {record['username']: record for record in chunk['user']}
+        for kind, field in (('post', 'author'), ('comment', 'author'),
+                            ('follow', 'user'), ('follow', 'author')):
+            for record in chunk[kind]:
+                records.setdefault(record[field], {})
+        names = {name for name in records if name not in self.users}
+        self.users.update(lookup(User.objects, 'username', names))
+        password = make_password(None)
+        self.bulk_create('user', User, [
+            User(
+                username=name,
+                first_name=records[name].get('first_name', ''),
+                last_name=records[name].get('last_name', ''),
+                email=records[name].get('email', ''),
+                password=password,
+            )
+            for name in names
+            if name not in self.users
+        ])
+        self.users.update(lookup(User.objects, 'username', names))
+
+    def write_groups(self, records: list) -> None:
+        slugs = {
+            record['slug'] for record in records
+            if record['slug'] not in self.groups
+        }
+        self.groups.update(lookup(Group.objects, 'slug', slugs))
+        self.bulk_create('group', Group, [
+            Group(
+                slug=record['slug'],
+                title=record['title'],
+                description=record.get('description', ''),
+            )
+            for record in records
+            if record['slug'] not in self.groups
+        ])
+        self.groups.update(lookup(Group.objects, 'slug', slugs))
+
+    def write_posts(self, records: list) -> None:
+        """Записывает посты с их id из источника.
+
+        Пост с неизвестной группой загружается без группы.
+        """
+        unknown = {
+            record['group'] for record in records
+            if record.get('group') and record['group'] not in self.groups
+        }
+        self.groups.update(lookup(Group.objects, 'slug', unknown))
+        self.bulk_create('post', Post, [
+            Post(
+                pk=record['id'],
+                author_id=self.users[record['author']],
+                group_id=self.groups.get(record.get('group')),
+                text=record['text'],
+                image=record.get('image', ''),
+                pub_date=record['pub_date'],
+            )
+            for record in records
+        ])
+
+    def write_comments(self, records: list) -> None:
+        posts = set(lookup(
+            Post.objects, 'pk', {record['post'] for record in records}
+        ))
+        comments = [
+            Comment(
+                post_id=record['post'],
+                author_id=self.users[record['author']],
+                text=record['text'],
+                pub_date=record['pub_date'],
+            )
+            for record in records
+            if record['post'] in posts
+        ]
+        self.skipped += len(records) - len(comments)
+        self.bulk_create('comment', Comment, comments)
+
+    def write_follows(self, records: list) -> None:
+        follows = [
+            Follow(
+                user_id=self.users[record['user']],
+                author_id=self.users[record['author']],
+            )
+            for record in records
+            if record['user'] != record['author']
+        ]
+        self.skipped += len(records) - len(follows)
+        self.bulk_create('follow', Follow, follows)
+
+    def rebuild(self) -> None:
+        self.stdout.write('Пересчёт счётчиков, лент и поискового индекса…')
+        bulk.rebuild()
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+from posts.models import Profile
+
+
+class Command(BaseCommand):
+    help = (
+        'Доводит до конца возврат авторов в ленты подписчиков, если фоновая '
+        'задача не успела: например, процесс перезапустили посреди неё.'
+    )
+
+    def handle(self, *args, **options):
+        authors = Profile.objects.filter(
+            feed=Profile.REFILL
+        ).values_list('user_id', flat=True)
+        count = 0
+        for author_id in authors:
+            timeline.refill(author_id)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Возвращено в ленты авторов: {count}.'
+        ))
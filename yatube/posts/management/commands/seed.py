@@ -0,0 +1,251 @@
+import io
+import random
+import time
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+from PIL import Image, ImageDraw
+
+from posts import bulk
+from posts.models import Comment, Follow, Group, Post, User
+
+TEXTS = 2000
+IMAGES = 16
+UNGROUPED = 0.3
+# Показатель Парето для числа подписок: среднее равно alpha / (alpha - 1).
+FOLLOWING_ALPHA = 2.0
+
+
+def zipf(count: int, exponent: float, rng: random.Random) -> list:
+    """Накопленные веса закона Ципфа в случайном порядке.
+
+    Ранг перемешивается, иначе самыми популярными всегда оказывались бы
+    первые по pk записи.
+    """
+    weights = [1 / rank ** exponent for rank in range(1, count + 1)]
+    rng.shuffle(weights)
+    return list(accumulate(weights))
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими данными: подписчики распределены '
+        'по степенному закону, группы и обсуждения — по закону Ципфа. '
+        'При одном и том же --seed данные получаются одинаковыми, '
+        'меняется только точка отсчёта дат.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument(
+            '--users', type=int,
+            help='Пользователей; по умолчанию десятая часть постов.',
+        )
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument(
+            '--comments', type=float, default=2.0,
+            help='Комментариев на пост в среднем.',
+        )
+        parser.add_argument(
+            '--follows', type=float, default=10.0,
+            help='Подписок на пользователя в среднем.',
+        )
+        parser.add_argument(
+            '--images', type=float, default=0.0,
+            help='Доля постов с картинкой, от 0 до 1.',
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней до запуска начинаются посты.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Строк в одном INSERT.',
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        posts = options['posts']
+        users = options['users'] or max(posts // 10, 2)
+        if posts < 1 or users < 2 or options['groups'] < 1:
+            raise CommandError('Нужны хотя бы пост, группа и два автора.')
+        if not 0 <= options['images'] <= 1:
+            raise CommandError('--images задаётся долей от 0 до 1.')
+        self.rng = random.Random(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(options['seed'])
+        self.until = timezone.now()
+        started = time.monotonic()
+        with transaction.atomic(), bulk.source_dates():
+            users = self.write_users(users)
+            groups = self.write_groups(options['groups'])
+            dates = self.write_posts(posts, users, groups)
+            follows = self.write_follows(users)
+            comments = self.write_comments(dates, users)
+        self.stdout.write('Пересчёт счётчиков, лент и поискового индекса…')
+        bulk.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: пользователей {len(users)}, групп {len(groups)}, '
+            f'постов {posts}, подписок {follows}, комментариев {comments} '
+            f'за {time.monotonic() - started:.0f} с.'
+        ))
+
+    def bulk_create(self, model, objects) -> int:
+        """Пишет объекты пачками, не держа в памяти больше одной пачки."""
+        written = 0
+        batch = []
+        for instance in objects:
+            batch.append(instance)
+            if len(batch) >= self.options['batch_size']:
+                model.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        model.objects.bulk_create(batch)
+        return written + len(batch)
+
+    def next_pk(self, model) -> int:
+        return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+    def write_users(self, count: int) -> range:
+        """Пользователи получают pk заранее, чтобы не перечитывать их."""
+        first = self.next_pk(User)
+        password = make_password(None)
+        fake = self.fake
+        self.bulk_create(User, (
+            User(
+                pk=pk,
+                username=f'{fake.user_name()}_{pk}',
+                first_name=fake.first_name(),
+                last_name=fake.last_name(),
+                password=password,
+            )
+            for pk in range(first, first + count)
+        ))
+        return range(first, first + count)
+
+    def write_groups(self, count: int) -> range:
+        first = self.next_pk(Group)
+        self.bulk_create(Group, (
+            Group(
+                pk=pk,
+                slug=f'group-{pk}',
+                title=self.fake.sentence(nb_words=2).rstrip('.'),
+                description=self.fake.paragraph(),
+            )
+            for pk in range(first, first + count)
+        ))
+        return range(first, first + count)
+
+    def write_posts(self, count: int, users: range, groups: range) -> list:
+        """Посты идут по возрастанию даты, как если бы их публиковали.
+
+        Возвращает пары ``(pk, pub_date)`` для комментариев.
+        """
+        rng = self.rng
+        texts = [self.fake.paragraph(nb_sentences=4) for _ in range(TEXTS)]
+        images = self.images() if self.options['images'] else []
+        authors = zipf(len(users), 0.8, rng)
+        sizes = zipf(len(groups), 1.0, rng)
+        first = self.next_pk(Post)
+        span = timedelta(days=self.options['days']) / count
+        start = self.until - span * count
+        dates = []
+
+        def posts():
+            for index in range(count):
+                pub_date = start + span * (index + rng.random())
+                dates.append((first + index, pub_date))
+                yield Post(
+                    pk=first + index,
+                    author_id=rng.choices(users, cum_weights=authors)[0],
+                    group_id=(
+                        None if rng.random() < UNGROUPED
+                        else rng.choices(groups, cum_weights=sizes)[0]
+                    ),
+                    text=rng.choice(texts),
+                    image=(
+                        rng.choice(images)
+                        if rng.random() < self.options['images'] else ''
+                    ),
+                    pub_date=pub_date,
+                )
+
+        self.bulk_create(Post, posts())
+        return dates
+
+    def write_follows(self, users: range) -> int:
+        """Число подписчиков автора подчиняется закону Ципфа.
+
+        Число подписок каждого пользователя — распределению Парето
+        со средним ``--follows``.
+        """
+        rng = self.rng
+        popularity = zipf(len(users), 1.0, rng)
+        scale = (
+            self.options['follows']
+            * (FOLLOWING_ALPHA - 1) / FOLLOWING_ALPHA
+        )
+
+        def follows():
+            for user_id in users:
+                count = min(
+                    int(scale * rng.paretovariate(FOLLOWING_ALPHA)),
+                    len(users) - 1,
+                )
+                authors = set(
+                    rng.choices(users, cum_weights=popularity, k=count)
+                )
+                authors.discard(user_id)
+                for author_id in sorted(authors):
+                    yield Follow(user_id=user_id, author_id=author_id)
+
+        return self.bulk_create(Follow, follows())
+
+    def write_comments(self, dates: list, users: range) -> int:
+        """Обсуждения сосредоточены на немногих постах."""
+        rng = self.rng
+        texts = [self.fake.sentence() for _ in range(TEXTS)]
+        popularity = zipf(len(dates), 1.0, rng)
+        count = round(len(dates) * self.options['comments'])
+        posts = sorted(rng.choices(dates, cum_weights=popularity, k=count))
+        return self.bulk_create(Comment, (
+            Comment(
+                post_id=post_id,
+                author_id=rng.choice(users),
+                text=rng.choice(texts),
+                pub_date=min(
+                    pub_date + timedelta(hours=48 * rng.random()),
+                    self.until,
+                ),
+            )
+            for post_id, pub_date in posts
+        ))
+
+    def images(self) -> list:
+        """Несколько картинок, которые разделяют все посты с картинкой."""
+        names = []
+        for number in range(IMAGES):
+            image = Image.new('RGB', (640, 480), self.color())
+            draw = ImageDraw.Draw(image)
+            for _ in range(4):
+                x, y = self.rng.randrange(560), self.rng.randrange(400)
+                draw.ellipse((x, y, x + 80, y + 80), fill=self.color())
+            content = io.BytesIO()
+            image.save(content, 'JPEG')
+            names.append(default_storage.save(
+                f'posts/seed-{self.options["seed"]}-{number}.jpg',
+                ContentFile(content.getvalue()),
+            ))
+        return names
+
+    def color(self) -> tuple:
+        return tuple(self.rng.randrange(256) for _ in range(3))
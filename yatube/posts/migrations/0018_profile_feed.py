@@ -0,0 +1,27 @@
+# Generated by Django 2.2.16 on 2026-10-17 08:01
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_pulled(apps, schema_editor):
+    Profile = apps.get_model('posts', 'Profile')
+    Profile.objects.filter(
+        followers_count__gte=settings.FEED_PULL_THRESHOLD
+    ).update(feed=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_post_updated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='feed',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Раскладываются по лентам'), (1, 'Читаются при показе ленты'), (2, 'Возвращаются в ленты')], default=0, verbose_name='Лента подписчиков'),
+        ),
+        migrations.RunPython(mark_pulled, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 2.2.16 on 2026-10-17 08:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_profile_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=1000, unique=True, verbose_name='Файл')),
+                ('done', models.PositiveIntegerField(default=0, verbose_name='Записано строк')),
+            ],
+        ),
+    ]
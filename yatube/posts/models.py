@@ -12,6 +12,11 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(
+        'Постов в группе',
+        default=0,
+        editable=False
+    )
 
     def __str__(self):
         return self.title
@@ -43,11 +48,34 @@ class Post(CreatedModel):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        'Комментариев',
+        default=0,
+        editable=False
+    )
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(
+                name='posts_post_feed_idx',
+                fields=['-pub_date', '-id'],
+            ),
+            models.Index(
+                name='posts_post_author_feed_idx',
+                fields=['author', '-pub_date', '-id'],
+            ),
+            models.Index(
+                name='posts_post_group_feed_idx',
+                fields=['group', '-pub_date', '-id'],
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -71,6 +99,14 @@ class Comment(CreatedModel):
         validators=[validate_not_empty]
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                name='posts_comment_post_idx',
+                fields=['post', 'pub_date'],
+            ),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -91,3 +127,90 @@ class Follow(models.Model):
                 fields=['user', 'author'],
             ),
         ]
+
+
+class Profile(models.Model):
+    """Счётчики пользователя, которые иначе считались бы через COUNT(*).
+
+    Обновляются выражениями F() при создании и удалении постов и подписок,
+    расхождения исправляет команда ``recount``. ``feed`` — как посты автора
+    попадают в ленты подписчиков, см. ``posts.timeline``.
+    """
+    PUSH = 0
+    PULL = 1
+    REFILL = 2
+    FEED_CHOICES = [
+        (PUSH, 'Раскладываются по лентам'),
+        (PULL, 'Читаются при показе ленты'),
+        (REFILL, 'Возвращаются в ленты'),
+    ]
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='profile',
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+    feed = models.PositiveSmallIntegerField(
+        'Лента подписчиков',
+        choices=FEED_CHOICES,
+        default=PUSH,
+    )
+
+    class Meta:
+        verbose_name = 'Профиль'
+        verbose_name_plural = 'Профили'
+
+    def __str__(self):
+        return str(self.user)
+
+
+class TimelineEntry(models.Model):
+    """Пост в ленте подписок конкретного пользователя.
+
+    Строки раскладываются при публикации поста и подписке, поэтому лента
+    читается одним срезом по индексу без соединения с Follow.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                name='posts_timelineentry_unique',
+                fields=['user', 'post'],
+            ),
+        ]
+        indexes = [
+            models.Index(
+                name='posts_timeline_feed_idx',
+                fields=['user', '-pub_date', '-post'],
+            ),
+        ]
+
+
+class ImportCheckpoint(models.Model):
+    """Сколько строк файла уже записала команда ``import_yatube``.
+
+    Обновляется в той же транзакции, что и порция строк, поэтому после
+    сбоя --resume не запишет порцию второй раз.
+    """
+    path = models.CharField('Файл', max_length=1000, unique=True)
+    done = models.PositiveIntegerField('Записано строк', default=0)
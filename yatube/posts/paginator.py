@@ -0,0 +1,165 @@
+import heapq
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q, QuerySet
+from django.http import HttpRequest
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу вместо COUNT(*) и OFFSET.
+
+    Страница выбирается условием «после позиции из курсора» по паре полей
+    ``ordering``, поэтому её стоимость не зависит от глубины в ленте.
+    Оба поля должны сортироваться в одном направлении, а второе поле
+    должно быть уникальным.
+    """
+    keyset = True
+
+    def __init__(self, object_list: QuerySet, per_page: int,
+                 ordering: tuple = ('-pub_date', '-pk')) -> None:
+        super().__init__(object_list.order_by(*ordering), per_page)
+        self.descending = ordering[0].startswith('-')
+        self.fields = tuple(name.lstrip('-') for name in ordering)
+
+    def cursor_page(self, cursor: str = None) -> Page:
+        """Возвращает страницу, на которую указывает курсор.
+
+        Пустой или испорченный курсор означает первую страницу.
+        """
+        direction, position = self.decode_cursor(cursor)
+        backwards = direction == PREVIOUS
+        rows = self.fetch(position, backwards)
+        if backwards and not rows:
+            return self.cursor_page()
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+        page = Page(rows, None, self)
+        has_next = has_more if not backwards else position is not None
+        has_previous = has_more if backwards else position is not None
+        page.next_cursor = (
+            self.encode_cursor(NEXT, rows[-1]) if has_next else None
+        )
+        page.previous_cursor = (
+            self.encode_cursor(PREVIOUS, rows[0]) if has_previous else None
+        )
+        return page
+
+    def fetch(self, position: tuple, backwards: bool) -> list:
+        """Выбирает per_page + 1 строк после позиции.
+
+        Лишняя строка показывает, есть ли что-то дальше.
+        """
+        queryset = self.object_list
+        if backwards:
+            queryset = queryset.reverse()
+        if position is not None:
+            queryset = queryset.filter(self.after(position, backwards))
+        return list(queryset[:self.per_page + 1])
+
+    def after(self, position: tuple, backwards: bool) -> Q:
+        """Условие «строго после позиции» в порядке обхода.
+
+        Лишнее нестрогое условие по первому полю даёт базе границу для
+        поиска по индексу; без него OR заставляет её перебирать строки от
+        начала ленты до позиции.
+        """
+        first, second = self.fields
+        first_value, second_value = position
+        lookup = 'lt' if self.descending != backwards else 'gt'
+        return Q(**{f'{first}__{lookup}e': first_value}) & (
+            Q(**{f'{first}__{lookup}': first_value})
+            | Q(**{first: first_value, f'{second}__{lookup}': second_value})
+        )
+
+    def encode_cursor(self, direction: str, obj) -> str:
+        values = [str(getattr(obj, name)) for name in self.fields]
+        raw = '|'.join([direction, *values]).encode()
+        return urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor: str) -> tuple:
+        """Разбирает курсор в пару (направление, позиция).
+
+        Позиция приводится к типам полей модели, чтобы сравнение в базе
+        шло по значениям, а не по строкам.
+        """
+        if not cursor:
+            return NEXT, None
+        try:
+            raw = urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, *values = raw.decode().split('|')
+            position = self.parse_position(values)
+        except (ValueError, ValidationError):
+            return NEXT, None
+        if direction not in (NEXT, PREVIOUS) or len(position) != 2:
+            return NEXT, None
+        if None in position:
+            return NEXT, None
+        return direction, position
+
+    def parse_position(self, values: list) -> tuple:
+        opts = self.object_list.model._meta
+        return tuple(
+            (opts.pk if name == 'pk' else opts.get_field(name))
+            .to_python(value)
+            for name, value in zip(self.fields, values)
+        )
+
+
+class MergedCursorPaginator(CursorPaginator):
+    """Курсорный пагинатор поверх нескольких отсортированных источников.
+
+    Источник — это пара из CursorPaginator и функции, которая превращает
+    его строку в объект страницы (``None``, если строка уже подходит).
+    Каждый источник отдаёт не больше per_page + 1 строк после позиции,
+    а страница собирается k-путевым слиянием по ``ordering``. Поля ключа
+    источников должны соответствовать ``ordering`` по порядку и типам.
+    """
+
+    def __init__(self, sources: list, per_page: int,
+                 ordering: tuple = ('-pub_date', '-pk')) -> None:
+        first_source, _ = sources[0]
+        super().__init__(first_source.object_list, per_page, ordering)
+        self.sources = sources
+
+    def fetch(self, position: tuple, backwards: bool) -> list:
+        streams = []
+        for source, to_item in self.sources:
+            rows = source.fetch(position, backwards)
+            streams.append(map(to_item, rows) if to_item else rows)
+        merged = heapq.merge(
+            *streams,
+            key=attrgetter(*self.fields),
+            reverse=self.descending != backwards,
+        )
+        return [item for item, _ in zip(merged, range(self.per_page + 1))]
+
+    def decode_cursor(self, cursor: str) -> tuple:
+        first_source, _ = self.sources[0]
+        return first_source.decode_cursor(cursor)
+
+
+def paginate(request: HttpRequest, queryset: QuerySet,
+             ordering: tuple = ('-pub_date', '-pk'),
+             cursor_paginator: CursorPaginator = None) -> Page:
+    """Возвращает страницу ленты для текущего запроса.
+
+    Старые ссылки вида ``?page=N`` по-прежнему обслуживаются обычным
+    постраничным выводом по ``queryset``, всё остальное идёт через курсор.
+    Ленты из нескольких источников передают готовый ``cursor_paginator``.
+    """
+    page_number = request.GET.get('page')
+    if page_number is not None and 'cursor' not in request.GET:
+        paginator = Paginator(queryset.order_by(*ordering), settings.PAGES)
+        return paginator.get_page(page_number)
+    if cursor_paginator is None:
+        cursor_paginator = CursorPaginator(queryset, settings.PAGES, ordering)
+    return cursor_paginator.cursor_page(request.GET.get('cursor'))
@@ -0,0 +1,134 @@
+import re
+
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import QuerySet
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+from .paginator import CursorPaginator
+
+TABLE = 'posts_post_fts'
+SNIPPET_TOKENS = 12
+# Границы совпадения в сниппете. Управляющие символы не встречаются
+# в тексте постов и переживают экранирование HTML.
+MARK_START = '\x02'
+MARK_END = '\x03'
+TERM = re.compile(r'\w+')
+
+
+def enabled() -> bool:
+    """Поиск работает только поверх FTS5, то есть на SQLite."""
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(query: str) -> str:
+    """Превращает пользовательский ввод в безопасное выражение MATCH.
+
+    Каждое слово становится отдельной фразой в кавычках, так что
+    операторы FTS5 в запросе не срабатывают; все слова обязательны.
+    """
+    return ' '.join(f'"{term}"' for term in TERM.findall(query))
+
+
+def index(post: Post) -> None:
+    if not enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post.pk])
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, text) VALUES (%s, %s)',
+            [post.pk, post.text],
+        )
+
+
+def remove(post_id: int) -> None:
+    if not enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post_id])
+
+
+def rebuild() -> None:
+    """Заново заполняет индекс по всем постам."""
+    if not enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, text) '
+            f'SELECT id, text FROM posts_post'
+        )
+
+
+def filter_posts(queryset: QuerySet, query: str) -> QuerySet:
+    """Оставляет в ``queryset`` посты, найденные по индексу."""
+    expression = match_expression(query)
+    if not expression:
+        return queryset.none()
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s', (expression,)
+    ))
+
+
+def highlight(snippet: str) -> str:
+    return mark_safe(
+        escape(snippet)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+class SearchPaginator(CursorPaginator):
+    """Курсорный пагинатор по результатам полнотекстового поиска.
+
+    Ключ страницы — пара (релевантность bm25, id поста): чем меньше
+    ``rank``, тем выше пост в выдаче. У каждого поста на странице есть
+    ``search_rank`` и подсвеченный ``snippet``.
+    """
+
+    def __init__(self, query: str, per_page: int) -> None:
+        Paginator.__init__(self, Post.objects.none(), per_page)
+        self.expression = match_expression(query)
+        self.descending = False
+        self.fields = ('search_rank', 'pk')
+
+    def fetch(self, position: tuple, backwards: bool) -> list:
+        if not self.expression:
+            return []
+        params = [MARK_START, MARK_END, SNIPPET_TOKENS, self.expression]
+        where = ''
+        if position is not None:
+            lookup = '<' if backwards else '>'
+            where = (
+                f'AND (rank {lookup} %s OR (rank = %s AND rowid {lookup} %s))'
+            )
+            params += [position[0], position[0], position[1]]
+        order = 'DESC' if backwards else 'ASC'
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, rank, '
+                f"snippet({TABLE}, 0, %s, %s, '…', %s) "
+                f'FROM {TABLE} WHERE {TABLE} MATCH %s {where} '
+                f'ORDER BY rank {order}, rowid {order} LIMIT %s',
+                params + [self.per_page + 1],
+            )
+            rows = cursor.fetchall()
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [pk for pk, _, _ in rows]
+        )
+        found = []
+        for pk, rank, snippet in rows:
+            post = posts.get(pk)
+            if post is None:
+                continue
+            post.search_rank = rank
+            post.snippet = highlight(snippet)
+            found.append(post)
+        return found
+
+    def parse_position(self, values: list) -> tuple:
+        rank, pk = values
+        return float(rank), int(pk)
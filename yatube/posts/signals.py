@@ -0,0 +1,90 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.signals import replica_sync_started
+
+from . import cache, cards, counters, search, thumbnails, timeline
+from .models import Comment, Follow, Group, Post, Profile, User
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance: User, created: bool, **kwargs) -> None:
+    if created:
+        Profile.objects.get_or_create(user=instance)
+    elif kwargs.get('update_fields') != {'last_login'}:
+        # Имя автора есть в карточках его постов; вход на сайт не в счёт.
+        cache.bump('cards')
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance: Post, **kwargs) -> None:
+    if instance._state.adding:
+        return
+    instance._saved_author_group = Post.objects.filter(
+        pk=instance.pk
+    ).values_list('author_id', 'group_id').first()
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance: Post, created: bool, **kwargs) -> None:
+    cache.bump('posts')
+    thumbnails.schedule(instance)
+    search.index(instance)
+    if created:
+        counters.post_added(instance)
+        timeline.fan_out(instance)
+        return
+    saved = getattr(instance, '_saved_author_group', None)
+    if saved is not None:
+        counters.post_moved(instance, *saved)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance: Post, **kwargs) -> None:
+    cache.bump('posts')
+    cards.forget(instance)
+    counters.post_added(instance, -1)
+    search.remove(instance.pk)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance: Group, **kwargs) -> None:
+    cache.bump('posts')
+    cache.bump('cards')
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance: Comment, created: bool,
+                  **kwargs) -> None:
+    cache.bump('comments')
+    if created:
+        counters.comment_added(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance: Comment, **kwargs) -> None:
+    cache.bump('comments')
+    counters.comment_added(instance, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance: Follow, created: bool, **kwargs) -> None:
+    cache.bump('follows')
+    if created:
+        counters.follow_added(instance)
+        timeline.follower_added(instance.author_id)
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance: Follow, **kwargs) -> None:
+    cache.bump('follows')
+    counters.follow_added(instance, -1)
+    timeline.prune(instance.user_id, instance.author_id)
+    timeline.follower_removed(instance.author_id)
+
+
+@receiver(replica_sync_started)
+def replica_syncing(sender, alias: str, **kwargs) -> None:
+    cache.snapshot(alias)
@@ -0,0 +1,246 @@
+import csv
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import benchmark, export, search
+from ..models import (
+    Comment, Follow, Group, ImportCheckpoint, Post, Profile, TimelineEntry,
+)
+
+User = get_user_model()
+
+RECORDS = [
+    {'type': 'user', 'username': 'writer', 'first_name': 'Лев'},
+    {'type': 'group', 'slug': 'imported', 'title': 'Импорт'},
+    {'type': 'post', 'id': 501, 'author': 'writer', 'group': 'imported',
+     'text': 'Перенесённый пост', 'pub_date': '2020-01-02T03:04:05Z'},
+    {'type': 'post', 'id': 502, 'author': 'writer', 'text': 'Второй пост'},
+    {'type': 'comment', 'post': 501, 'author': 'reader', 'text': 'Ок'},
+    {'type': 'comment', 'post': 999, 'author': 'reader', 'text': 'Мимо'},
+    {'type': 'follow', 'user': 'reader', 'author': 'writer'},
+]
+
+
+class ImportCommandTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'dump.jsonl')
+        with open(self.path, 'w', encoding='utf-8') as stream:
+            for record in RECORDS:
+                stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_import_writes_rows_and_rebuilds_derived_data(self):
+        """Импорт загружает данные и пересчитывает то,
+        что обычно делают сигналы."""
+        call_command('import_yatube', self.path, chunk_size=3,
+                     stdout=StringIO())
+        writer = User.objects.get(username='writer')
+        reader = User.objects.get(username='reader')
+        post = Post.objects.get(pk=501)
+        self.assertEqual(writer.first_name, 'Лев')
+        self.assertEqual(post.group, Group.objects.get(slug='imported'))
+        self.assertEqual(
+            post.pub_date, datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+        )
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertTrue(Follow.objects.filter(
+            user=reader, author=writer).exists())
+        self.assertEqual(Profile.objects.get(user=writer).posts_count, 2)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=reader).count(), 2
+        )
+        if search.enabled():
+            self.assertEqual(
+                list(search.filter_posts(Post.objects.all(), 'Перенесённый')),
+                [post],
+            )
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+    def test_resume_skips_committed_lines(self):
+        """--resume продолжает с сохранённой строки."""
+        ImportCheckpoint.objects.create(path=self.path, done=3)
+        call_command('import_yatube', self.path, resume=True,
+                     skip_rebuild=True, stdout=StringIO())
+        self.assertFalse(Post.objects.filter(pk=501).exists())
+        self.assertTrue(Post.objects.filter(pk=502).exists())
+        self.assertFalse(Group.objects.filter(slug='imported').exists())
+
+    def test_resume_after_failure_does_not_repeat_chunk(self):
+        """Отметка пишется вместе с порцией: после сбоя --resume
+        не загружает комментарии второй раз."""
+        with open(self.path, 'a', encoding='utf-8') as stream:
+            stream.write('{}\n')
+        with self.assertRaises(CommandError):
+            call_command('import_yatube', self.path, chunk_size=5,
+                         skip_rebuild=True, stdout=StringIO())
+        self.assertEqual(ImportCheckpoint.objects.get().done, 5)
+        with open(self.path, 'w', encoding='utf-8') as stream:
+            for record in RECORDS:
+                stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+        call_command('import_yatube', self.path, resume=True,
+                     skip_rebuild=True, stdout=StringIO())
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+    def test_repeated_import_reports_only_new_rows(self):
+        """Повторы, отброшенные базой, не попадают в число загруженных."""
+        call_command('import_yatube', self.path, stdout=StringIO())
+        out = StringIO()
+        call_command('import_yatube', self.path, stdout=out)
+        self.assertIn('user 0, group 0, post 0,', out.getvalue())
+        self.assertIn('follow 0,', out.getvalue())
+
+    def test_record_without_required_field_names_its_line(self):
+        """Запись без обязательного поля останавливает импорт
+        с номером строки, а не с трассировкой."""
+        with open(self.path, 'a', encoding='utf-8') as stream:
+            stream.write(json.dumps({'type': 'post', 'author': 'x'}) + '\n')
+        with self.assertRaisesMessage(
+            CommandError, f'Строка {len(RECORDS) + 1}: нет полей id, text.'
+        ):
+            call_command('import_yatube', self.path, stdout=StringIO())
+
+
+class ExportTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='exporter')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin'
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Пост, с "кавычками"'
+        )
+        Comment.objects.create(post=cls.post, author=cls.reader, text='Ок')
+        Follow.objects.create(user=cls.reader, author=cls.user)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_jsonl_export_can_be_imported(self):
+        """Выгрузка в JSONL совпадает с форматом import_yatube."""
+        path = os.path.join(self.directory, 'dump.jsonl')
+        call_command('export_yatube', output=path)
+        with open(path, encoding='utf-8') as stream:
+            records = [json.loads(line) for line in stream]
+        self.assertEqual(
+            [record['type'] for record in records],
+            ['post', 'comment', 'follow'],
+        )
+        Post.objects.all().delete()
+        call_command('import_yatube', path, stdout=StringIO())
+        self.assertEqual(Post.objects.get().text, self.post.text)
+        self.assertEqual(Comment.objects.count(), 1)
+
+    def test_gzip_csv_export(self):
+        """CSV сжимается на лету и читается обычным gzip."""
+        path = os.path.join(self.directory, 'posts.csv.gz')
+        call_command('export_yatube', 'post', format='csv', gzip=True,
+                     output=path)
+        with gzip.open(path, 'rt', encoding='utf-8') as stream:
+            rows = list(csv.reader(stream))
+        self.assertEqual(rows[0], list(export.EXPORTS['post'][1]))
+        self.assertEqual(rows[1][3], self.post.text)
+
+    def test_admin_endpoint_streams_for_superuser_only(self):
+        """Выгрузку из админки получает только суперпользователь."""
+        url = reverse('admin:posts_post_export')
+        self.client.force_login(self.reader)
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(self.admin)
+        response = self.client.get(url, {'kind': 'follow', 'format': 'csv'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            b''.join(response.streaming_content).decode().splitlines(),
+            ['user,author', 'reader,exporter'],
+        )
+        response = self.client.get(url, {'kind': 'all'})
+        self.assertEqual(response.status_code, 400)
+
+
+class SeedCommandTest(TestCase):
+
+    def snapshot(self) -> dict:
+        return {
+            'users': list(User.objects.values_list('pk', 'username')),
+            'posts': list(Post.objects.order_by('pk').values_list(
+                'pk', 'author_id', 'group_id', 'text', 'image'
+            )),
+            'follows': list(Follow.objects.order_by(
+                'user_id', 'author_id'
+            ).values_list('user_id', 'author_id')),
+            'comments': list(Comment.objects.order_by('pk').values_list(
+                'post_id', 'author_id', 'text'
+            )),
+        }
+
+    def test_seed_is_deterministic(self):
+        call_command('seed', posts=300, seed=7, stdout=StringIO())
+        first = self.snapshot()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        call_command('seed', posts=300, seed=7, stdout=StringIO())
+        self.assertEqual(self.snapshot(), first)
+        call_command('seed', posts=300, seed=8, stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 600)
+
+    def test_seed_rebuilds_derived_data(self):
+        call_command(
+            'seed', posts=500, users=50, comments=3, stdout=StringIO()
+        )
+        self.assertEqual(User.objects.count(), 50)
+        self.assertEqual(Comment.objects.count(), 1500)
+        self.assertEqual(Profile.objects.count(), 50)
+        self.assertTrue(TimelineEntry.objects.exists())
+        dates = Post.objects.values_list('pub_date', flat=True)
+        self.assertGreater(max(dates) - min(dates), timedelta(days=300))
+        popular = Profile.objects.order_by('-followers_count').first()
+        self.assertGreater(
+            popular.followers_count,
+            Follow.objects.count() / 50 * 2,
+        )
+
+
+class BenchmarkTest(TestCase):
+
+    def test_seed_and_measure(self):
+        benchmark.seed(200)
+        self.assertEqual(Post.objects.count(), 200)
+        reader, targets = benchmark.targets()
+        self.assertEqual(set(targets), set(benchmark.VIEWS))
+        result = benchmark.measure(reader, targets['add_comment'], 5, 1)
+        self.assertEqual(result['requests'], 5)
+        self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        self.assertEqual(
+            Comment.objects.filter(text='Коммент замера').count(), 5
+        )
+
+    def test_compare_flags_regressions_beyond_tolerance(self):
+        baseline = {'10000': {'index': {'rps': 100, 'p95_ms': 10}}}
+        within = {'10000': {'index': {'rps': 90, 'p95_ms': 11},
+                            'profile': {'rps': 1, 'p95_ms': 1000}}}
+        worse = {'10000': {'index': {'rps': 70, 'p95_ms': 13}}}
+        self.assertEqual(benchmark.compare(within, baseline, 0.2), [])
+        self.assertEqual(len(benchmark.compare(worse, baseline, 0.2)), 2)
@@ -1,12 +1,20 @@
 import shutil
 import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import get_thumbnail
+from sorl.thumbnail.images import deserialize_image_file
 
+from posts import thumbnails
 from posts.forms import CommentForm
 from posts.models import Comment, Group, Post
 
@@ -148,3 +156,132 @@ class PostCreateFormTests(TestCase):
         )
         self.assertEqual(Comment.objects.count(), comment_count)
         self.assertEqual(response.status_code, 200)
+
+    @staticmethod
+    def png(name, size):
+        file_obj = BytesIO()
+        Image.new('RGB', size=size, color=(255, 0, 0)).save(file_obj, 'png')
+        return SimpleUploadedFile(
+            name=name,
+            content=file_obj.getvalue(),
+            content_type='image/png'
+        )
+
+    @override_settings(IMAGE_UPLOAD_MAX_DIMENSIONS=(40, 40))
+    def test_create_rejects_oversized_dimensions(self):
+        """Картинка больше допустимых размеров отбрасывается при загрузке."""
+        posts_count = Post.objects.count()
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Большая картинка', 'image': self.png(
+                'big.png', (50, 50))},
+        )
+        self.assertEqual(Post.objects.count(), posts_count)
+        self.assertFormError(
+            response, 'form', 'image',
+            'Картинка 50×50 больше допустимых 40×40 точек.'
+        )
+
+    @override_settings(IMAGE_UPLOAD_MAX_SIZE=100)
+    def test_edit_rejects_oversized_file(self):
+        """Слишком тяжёлый файл не сохраняется при редактировании."""
+        response = self.authorized_client.post(
+            reverse('posts:post_edit',
+                    kwargs={'post_id': f'{self.post.pk}'}),
+            data={'text': 'Тяжёлая картинка', 'image': self.png(
+                'heavy.png', (300, 300))},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('image', response.context['form'].errors)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.text, 'Тестовая пост')
+
+    def test_create_accepts_image_within_limits(self):
+        """Картинка в пределах ограничений сохраняется с постом."""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Маленькая картинка', 'image': self.png(
+                'fine.png', (20, 20))},
+        )
+        post = Post.objects.get(text='Маленькая картинка')
+        self.assertEqual(post.image.name, 'posts/fine.png')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self):
+        user = User.objects.create_user(username='thumbs')
+        return Post.objects.create(
+            author=user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(
+                name='thumb.gif',
+                content=(
+                    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+                    b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+                    b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+                    b'\x00\x00\x01\x00\x01\x00\x00\x02'
+                    b'\x02\x4c\x01\x00\x3b'
+                ),
+                content_type='image/gif'
+            ),
+        )
+
+    def test_generate_builds_every_preset(self):
+        """Миниатюры всех размеров строятся заранее и попадают в кеш."""
+        post = self.create_post()
+        thumbnails.generate(post.image.name)
+        for geometry, options in settings.THUMBNAIL_PRESETS:
+            with self.subTest(geometry=geometry):
+                value = cache.get(thumbnails.thumbnail_key(
+                    post.image.name, geometry, options))
+                self.assertIsNotNone(value)
+                self.assertTrue(deserialize_image_file(value).exists())
+
+    def test_attach_reads_thumbnails_without_database(self):
+        """Готовые миниатюры страницы берутся из кеша без запросов."""
+        post = self.create_post()
+        plain = Post.objects.create(author=post.author, text='Без картинки')
+        thumbnails.generate(post.image.name)
+        geometry, options = settings.THUMBNAIL_PRESETS[0]
+        expected = get_thumbnail(post.image, geometry, **options)
+        with self.assertNumQueries(0):
+            thumbnails.attach([post, plain])
+        self.assertEqual(post.thumbnail.url, expected.url)
+        self.assertIsNone(plain.thumbnail)
+
+    def test_attach_leaves_missing_thumbnail_to_placeholder(self):
+        """Непостроенная миниатюра не строится в запросе: карточка
+        показывает заглушку, а команда build_thumbnails её достраивает."""
+        post = self.create_post()
+        with mock.patch('posts.thumbnails.get_thumbnail') as build:
+            thumbnails.attach([post])
+        build.assert_not_called()
+        self.assertIsNone(post.thumbnail)
+        call_command('build_thumbnails', stdout=StringIO())
+        thumbnails.attach([post])
+        self.assertIsNotNone(post.thumbnail)
+
+    @override_settings(THUMBNAIL_WORKERS=2)
+    def test_lost_thumbnail_is_queued_again_once(self):
+        """Если ключ пропал из кеша, лента ставит миниатюру в очередь,
+        но не чаще раза в THUMBNAIL_RETRY_SECONDS."""
+        post = self.create_post()
+        thumbnails.generate(post.image.name)
+        cache.clear()
+        with mock.patch.object(thumbnails, 'executor') as executor:
+            thumbnails.attach([post])
+            thumbnails.attach([post])
+        self.assertIsNone(post.thumbnail)
+        executor().submit.assert_called_once_with(
+            thumbnails._generate_in_worker, post.image.name
+        )
+        thumbnails.generate(post.image.name)
+        thumbnails.attach([post])
+        self.assertIsNotNone(post.thumbnail)
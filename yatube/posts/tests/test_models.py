@@ -1,7 +1,10 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..models import Comment, Follow, Group, Post, Profile
 
 User = get_user_model()
 
@@ -52,3 +55,79 @@ class PostModelTest(TestCase):
         post = self.post
         expected_object_name = post.text
         self.assertEqual(expected_object_name, str(post))
+
+
+class CountersTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='counter')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='counters',
+            description='Тестовое описание',
+        )
+        cls.group2 = Group.objects.create(
+            title='Вторая группа',
+            slug='counters2',
+            description='Тестовое описание',
+        )
+
+    def profile(self, user):
+        return Profile.objects.get(user=user)
+
+    def test_counters_follow_create_and_delete(self):
+        """Счётчики меняются при создании и удалении записей."""
+        post = Post.objects.create(
+            author=self.user, text='Пост', group=self.group)
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Коммент')
+        follow = Follow.objects.create(user=self.reader, author=self.user)
+        post.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(self.profile(self.user).posts_count, 1)
+        self.assertEqual(self.profile(self.user).followers_count, 1)
+        self.assertEqual(self.profile(self.reader).following_count, 1)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.group.posts_count, 1)
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(self.profile(self.user).followers_count, 0)
+        self.assertEqual(self.profile(self.reader).following_count, 0)
+        post.delete()
+        self.group.refresh_from_db()
+        self.assertEqual(self.profile(self.user).posts_count, 0)
+        self.assertEqual(self.group.posts_count, 0)
+
+    def test_group_change_moves_post_count(self):
+        """Смена группы переносит пост между счётчиками групп."""
+        post = Post.objects.create(
+            author=self.user, text='Пост', group=self.group)
+        post.group = self.group2
+        post.save()
+        self.group.refresh_from_db()
+        self.group2.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.group2.posts_count, 1)
+
+    def test_recount_repairs_drift(self):
+        """Команда recount исправляет разошедшиеся счётчики."""
+        post = Post.objects.create(
+            author=self.user, text='Пост', group=self.group)
+        Comment.objects.create(post=post, author=self.reader, text='Ок')
+        Profile.objects.update(posts_count=42, followers_count=7)
+        Post.objects.update(comments_count=0)
+        Group.objects.update(posts_count=3)
+        Profile.objects.filter(user=self.reader).delete()
+        call_command('recount', stdout=StringIO())
+        post.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(self.profile(self.user).posts_count, 1)
+        self.assertEqual(self.profile(self.user).followers_count, 0)
+        self.assertEqual(self.profile(self.reader).posts_count, 0)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.group.posts_count, 1)
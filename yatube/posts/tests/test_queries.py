@@ -0,0 +1,98 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, Profile, TimelineEntry
+from .utils import QueryBudgetMixin
+
+User = get_user_model()
+
+ROWS = (10, 100, 1000)
+
+# Ленты и пост ещё делают один запрос за Last-Modified.
+BUDGETS = {
+    'posts:index': 4,
+    'posts:group_list': 3,
+    'posts:profile': 6,
+    'posts:post_detail': 5,
+    'posts:follow_index': 4,
+}
+
+
+class QueryBudgetTest(QueryBudgetMixin, TestCase):
+    """Число запросов представлений не растёт вместе с данными."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='budget',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def seed(self, rows: int) -> Post:
+        """Создаёт rows постов разных авторов с комментариями."""
+        User.objects.bulk_create(
+            User(username=f'author{rows}_{i}') for i in range(rows)
+        )
+        authors = list(User.objects.filter(username__startswith='author'))
+        Profile.objects.bulk_create(
+            Profile(user=author) for author in authors
+        )
+        Follow.objects.bulk_create(
+            Follow(user=self.reader, author=author) for author in authors
+        )
+        Post.objects.bulk_create(
+            Post(author=author, group=self.group, text=f'Пост {author}')
+            for author in authors
+        )
+        posts = list(Post.objects.all())
+        TimelineEntry.objects.bulk_create(
+            TimelineEntry(
+                user=self.reader,
+                post=post,
+                author_id=post.author_id,
+                pub_date=post.pub_date,
+            )
+            for post in posts
+        )
+        Comment.objects.bulk_create(
+            Comment(post=posts[0], author=author, text='Коммент')
+            for author in authors
+        )
+        return posts[0]
+
+    def urls(self, post: Post) -> dict:
+        return {
+            'posts:index': reverse('posts:index'),
+            'posts:group_list': reverse(
+                'posts:group_list', kwargs={'slug': self.group.slug}),
+            'posts:profile': reverse(
+                'posts:profile', kwargs={'username': post.author.username}),
+            'posts:post_detail': reverse(
+                'posts:post_detail', kwargs={'post_id': post.pk}),
+            'posts:follow_index': reverse('posts:follow_index'),
+        }
+
+    def test_views_stay_within_query_budget(self):
+        """Каждое представление укладывается в бюджет
+        при 10, 100 и 1000 строках."""
+        for rows in ROWS:
+            with self.subTest(rows=rows):
+                post = self.seed(rows)
+                for name, url in self.urls(post).items():
+                    with self.subTest(view=name):
+                        cache.clear()
+                        response = self.assertMaxQueries(
+                            BUDGETS[name], self.client.get, url)
+                        self.assertEqual(response.status_code, 200)
+                Post.objects.all().delete()
+                User.objects.filter(username__startswith='author').delete()
@@ -0,0 +1,103 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models import Comment, Follow, Group, Post, TimelineEntry
+from ..paginator import CursorPaginator
+
+User = get_user_model()
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN есть в SQLite')
+class QueryPlanTest(TestCase):
+    """Горячие запросы лент идут по индексам, без полного
+    просмотра таблицы и без сортировки во временном B-дереве."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='planner')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='plans',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовая пост',
+            group=cls.group,
+        )
+
+    def plan(self, queryset) -> list:
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertUsesIndexes(self, queryset):
+        steps = self.plan(queryset)
+        for step in steps:
+            self.assertNotIn('TEMP B-TREE', step, steps)
+            if step.startswith('SCAN'):
+                self.assertIn('INDEX', step, steps)
+
+    def feed_pages(self, queryset, ordering=('-pub_date', '-pk')):
+        """Первая страница ленты и страница после курсора."""
+        paginator = CursorPaginator(queryset, 10, ordering)
+        position = (timezone.now(), self.post.pk)
+        yield paginator.object_list[:11]
+        yield paginator.object_list.filter(
+            paginator.after(position, False))[:11]
+        yield paginator.object_list.reverse().filter(
+            paginator.after(position, True))[:11]
+
+    def test_feed_queries_use_indexes(self):
+        """Ленты index, group_list, profile и follow читаются по индексам."""
+        feeds = {
+            'index': (Post.objects.select_related('group'),),
+            'group_list': (Post.objects.filter(group=self.group),),
+            'profile': (self.user.posts.all(),),
+            'follow_index': (
+                TimelineEntry.objects.filter(
+                    user=self.user
+                ).select_related('post__author', 'post__group'),
+                ('-pub_date', '-post_id'),
+            ),
+            'comments': (
+                Comment.objects.filter(post=self.post),
+                ('pub_date', 'pk'),
+            ),
+        }
+        for name, args in feeds.items():
+            for queryset in self.feed_pages(*args):
+                with self.subTest(feed=name, sql=str(queryset.query)):
+                    self.assertUsesIndexes(queryset)
+
+    def test_follow_lookups_use_indexes(self):
+        """Подписки ищутся по паре (user, author) и по автору."""
+        lookups = (
+            Follow.objects.filter(user=self.user, author=self.user),
+            Follow.objects.filter(author=self.user),
+        )
+        for queryset in lookups:
+            with self.subTest(sql=str(queryset.query)):
+                self.assertUsesIndexes(queryset)
+
+    def test_cursor_pages_seek_to_position(self):
+        """Страница после курсора начинается с позиции, а не с начала."""
+        feeds = (
+            (Post.objects.all(), ('-pub_date', '-pk'), 'pub_date<?'),
+            (Comment.objects.filter(post=self.post), ('pub_date', 'pk'),
+             'pub_date>?'),
+        )
+        position = (timezone.now(), self.post.pk)
+        for queryset, ordering, seek in feeds:
+            paginator = CursorPaginator(queryset, 10, ordering)
+            page = paginator.object_list.filter(
+                paginator.after(position, False)
+            )[:11]
+            with self.subTest(sql=str(page.query)):
+                self.assertIn(seek, ' '.join(self.plan(page)))
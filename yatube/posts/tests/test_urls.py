@@ -56,6 +56,7 @@ class PostURLTest(TestCase):
                     kwargs={'post_id':
                             f'{self.post.pk}'}): 'posts/create_post.html',
             reverse('posts:post_create'): 'posts/create_post.html',
+            reverse('posts:search'): 'posts/search.html',
         }
         for address, template in templates_url_names.items():
             with self.subTest(address=address):
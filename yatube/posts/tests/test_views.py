@@ -1,15 +1,21 @@
+import re
 import shutil
 import tempfile
+from datetime import timedelta
+from io import StringIO
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
-from ..models import Comment, Follow, Group, Post
+from .. import cache as posts_cache
+from .. import cards
+from ..models import Comment, Follow, Group, Post, Profile, TimelineEntry
 
 User = get_user_model()
 
@@ -211,14 +217,12 @@ class PostViewsTest(TestCase):
                 self.assertIsInstance(form_field, expected)
 
     def test_index_cache(self):
-        """Шаблон index кешируется."""
+        """Карточки главной берутся из кеша до изменения постов."""
+        cache.clear()
+        post = Post.objects.create(author=self.user, text='Без картинки')
         response_before = self.author_client.get(reverse('posts:index'))
         cache_before = response_before.content
-        Post.objects.create(
-            author=self.user,
-            text='текст для теста кеша',
-            group=self.group,
-        )
+        Post.objects.filter(pk=post.pk).update(text='мимо сигналов')
         response_after = self.author_client.get(reverse('posts:index'))
         cache_after = response_after.content
         self.assertEqual(cache_before, cache_after)
@@ -227,6 +231,29 @@ class PostViewsTest(TestCase):
         cache_after = response_after.content
         self.assertNotEqual(cache_before, cache_after)
 
+    def test_author_rename_reaches_index_and_etag(self):
+        """Новое имя автора видно на главной и меняет её ETag."""
+        cache.clear()
+        url = reverse('posts:index')
+        etag = self.author_client.get(url)['ETag']
+        self.user.first_name = 'Переименованный'
+        self.user.save()
+        response = self.author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Переименованный')
+
+    def test_index_cache_invalidated_by_new_post(self):
+        """Новый пост сразу появляется на закешированной главной."""
+        cache.clear()
+        self.author_client.get(reverse('posts:index'))
+        Post.objects.create(
+            author=self.user,
+            text='текст для теста кеша',
+            group=self.group,
+        )
+        response = self.author_client.get(reverse('posts:index'))
+        self.assertContains(response, 'текст для теста кеша')
+
     def test_follow_author(self):
         """Зарегистрированный пользователь может
         подписаться на авторов."""
@@ -300,6 +327,31 @@ class PostViewsTest(TestCase):
             response,
             self.post.text)
 
+    def test_timeline_follows_posts_and_unfollow(self):
+        """Новый пост попадает в ленту подписчика,
+        а после отписки посты автора из ленты убираются."""
+        self.authorized_client_follow.get(
+            reverse('posts:profile_follow',
+                    kwargs={'username': f'{self.user.username}'}))
+        new_post = Post.objects.create(
+            author=self.user,
+            text='Пост после подписки',
+        )
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=self.user2, post=new_post
+            ).exists()
+        )
+        response = self.authorized_client_follow.get(
+            reverse('posts:follow_index'))
+        self.assertEqual(response.context.get('page_obj')[0], new_post)
+        self.authorized_client_follow.get(
+            reverse('posts:profile_unfollow',
+                    kwargs={'username': f'{self.user.username}'}))
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.user2).exists()
+        )
+
 
 class PaginatorViewsTest(TestCase):
 
@@ -354,3 +406,469 @@ class PaginatorViewsTest(TestCase):
                             (template_context + '?page=2'))
 
         self.assertEqual(len(response.context.get('page_obj')), 3)
+
+    def test_cursor_pages_cover_whole_feed(self):
+        """Переход по курсорам index, group и profile проходит все посты
+        без повторов, а курсор назад возвращает на первую страницу."""
+        templates_context = {
+            reverse('posts:index'),
+            reverse('posts:group_list',
+                    kwargs={'slug': f'{self.group.slug}'}),
+            reverse('posts:profile',
+                    kwargs={'username': f'{self.user.username}'})
+        }
+        for template_context in templates_context:
+            with self.subTest(template_context=template_context):
+                first_page = self.authorized_client.get(
+                    template_context).context.get('page_obj')
+                self.assertIsNone(first_page.previous_cursor)
+                second_page = self.authorized_client.get(
+                    template_context,
+                    {'cursor': first_page.next_cursor}
+                ).context.get('page_obj')
+                self.assertEqual(len(second_page), 3)
+                self.assertIsNone(second_page.next_cursor)
+                seen = {post.pk for post in first_page}
+                seen |= {post.pk for post in second_page}
+                self.assertEqual(seen, {post.pk for post in self.post})
+                back_page = self.authorized_client.get(
+                    template_context,
+                    {'cursor': second_page.previous_cursor}
+                ).context.get('page_obj')
+                self.assertEqual(list(back_page), list(first_page))
+
+    def test_index_cache_depends_on_page(self):
+        """Вторая страница главной не отдаётся из кеша первой."""
+        cache.clear()
+        first_page = self.authorized_client.get(reverse('posts:index'))
+        second_page = self.authorized_client.get(
+            reverse('posts:index'), {'page': 2})
+        self.assertNotContains(second_page, 'Тестовая пост №13<')
+        self.assertContains(first_page, 'Тестовая пост №13<')
+        cursor_page = self.authorized_client.get(
+            reverse('posts:index'),
+            {'cursor': first_page.context.get('page_obj').next_cursor})
+        self.assertContains(cursor_page, 'Тестовая пост №1<')
+
+    def test_broken_cursor_shows_first_page(self):
+        """Испорченный курсор открывает первую страницу."""
+        response = self.authorized_client.get(
+            reverse('posts:index'), {'cursor': 'не-курсор'})
+        self.assertEqual(len(response.context.get('page_obj')), 10)
+
+
+@override_settings(FEED_PULL_THRESHOLD=2)
+class HybridFeedTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.fan = User.objects.create_user(username='fan')
+        cls.star = User.objects.create_user(username='star')
+        cls.author = User.objects.create_user(username='author')
+        for user in (cls.reader, cls.fan):
+            Follow.objects.create(user=user, author=cls.star)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.posts = []
+        for i in range(1, 14):
+            cls.posts.append(Post.objects.create(
+                author=cls.star if i % 2 else cls.author,
+                text=f'Пост ленты №{i}',
+            ))
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_star_posts_are_not_pushed(self):
+        """Посты автора с подписчиками выше порога
+        не раскладываются по лентам."""
+        self.assertFalse(
+            TimelineEntry.objects.filter(author=self.star).exists()
+        )
+        self.assertTrue(
+            TimelineEntry.objects.filter(author=self.author).exists()
+        )
+
+    def test_feed_merges_pushed_and_pulled_posts(self):
+        """Лента подписок сливает обе части в порядке публикации."""
+        first_page = self.reader_client.get(
+            reverse('posts:follow_index')).context.get('page_obj')
+        second_page = self.reader_client.get(
+            reverse('posts:follow_index'),
+            {'cursor': first_page.next_cursor}
+        ).context.get('page_obj')
+        self.assertEqual(
+            list(first_page) + list(second_page),
+            self.posts[::-1],
+        )
+
+    def follow_page(self, client):
+        return client.get(reverse('posts:follow_index')).context.get(
+            'page_obj'
+        )
+
+    @override_settings(FEED_PULL_THRESHOLD=4, FEED_PUSH_THRESHOLD=3)
+    def test_posts_return_when_author_drops_below_threshold(self):
+        """Автор пересекает порог в обе стороны, а подписчики, в том
+        числе подписавшиеся за это время, видят все его посты."""
+        rising = User.objects.create_user(username='rising')
+        late = User.objects.create_user(username='late')
+        extra = User.objects.create_user(username='extra')
+        Follow.objects.create(user=self.reader, author=rising)
+        before = Post.objects.create(author=rising, text='До порога')
+        for user in (self.fan, extra, late):
+            Follow.objects.create(user=user, author=rising)
+        during = Post.objects.create(author=rising, text='Выше порога')
+        Follow.objects.get(user=self.fan, author=rising).delete()
+        self.assertEqual(
+            Profile.objects.get(user=rising).feed, Profile.PULL,
+            'Между порогами режим не меняется',
+        )
+        Follow.objects.get(user=extra, author=rising).delete()
+        self.assertEqual(
+            Profile.objects.get(user=rising).feed, Profile.REFILL
+        )
+        late_client = Client()
+        late_client.force_login(late)
+        for refilled in (False, True):
+            if refilled:
+                call_command('refill_timelines', stdout=StringIO())
+            for client in (self.reader_client, late_client):
+                with self.subTest(refilled=refilled, client=client):
+                    page = self.follow_page(client)
+                    self.assertIn(before, page)
+                    self.assertIn(during, page)
+        self.assertEqual(Profile.objects.get(user=rising).feed, Profile.PUSH)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=late, author=rising).count(), 2
+        )
+
+
+class SearchViewTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='searcher')
+        cls.superuser = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.user,
+                text=f'Заметка №{i} про котиков и <b>разметку</b>',
+            )
+            for i in range(1, 14)
+        ]
+        cls.best = Post.objects.create(
+            author=cls.user,
+            text='котиков котиков котиков',
+        )
+        cls.other = Post.objects.create(
+            author=cls.user,
+            text='Совсем другая тема',
+        )
+
+    def search(self, query, cursor=None):
+        params = {'q': query}
+        if cursor:
+            params['cursor'] = cursor
+        return self.client.get(
+            reverse('posts:search'), params
+        ).context.get('page_obj')
+
+    def test_results_are_ranked_and_highlighted(self):
+        """Поиск сортирует по релевантности и подсвечивает совпадения,
+        не пропуская разметку из текста поста."""
+        page = self.search('котиков')
+        self.assertEqual(page[0], self.best)
+        self.assertNotIn(self.other, page)
+        self.assertIn('<mark>котиков</mark>', page[1].snippet)
+        self.assertIn('&lt;b&gt;', page[1].snippet)
+
+    def test_cursor_pages_cover_all_matches(self):
+        """Курсор проходит по всем найденным постам без повторов."""
+        first_page = self.search('котиков')
+        second_page = self.search('котиков', first_page.next_cursor)
+        self.assertEqual(len(first_page), settings.PAGES)
+        self.assertEqual(
+            set(first_page) | set(second_page),
+            set(self.posts) | {self.best},
+        )
+        self.assertIsNone(second_page.next_cursor)
+        previous_page = self.search('котиков', second_page.previous_cursor)
+        self.assertEqual(list(previous_page), list(first_page))
+
+    def test_index_follows_edit_and_delete(self):
+        """Индекс обновляется при изменении и удалении поста."""
+        self.other.text = 'Теперь про котиков'
+        self.other.save()
+        self.assertIn(self.other, self.search('котиков'))
+        self.other.delete()
+        self.assertEqual(list(self.search('Теперь')), [])
+
+    def test_query_syntax_is_not_interpreted(self):
+        """Операторы FTS5 в запросе не ломают поиск."""
+        self.assertEqual(list(self.search('"котиков OR ( *')), [])
+        self.assertEqual(list(self.search('')), [])
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт через полнотекстовый индекс."""
+        self.client.force_login(self.superuser)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'другая'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.other]
+        )
+
+
+class ConditionalGetTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='conditional')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='conditional',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Пост', group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.user)
+
+    def test_unchanged_pages_return_not_modified(self):
+        """Повторный запрос с ETag получает 304 без рендеринга."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.user.username,)),
+            reverse('posts:post_detail', args=(self.post.pk,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(response.has_header('Last-Modified'))
+                response = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(response.status_code, 304)
+
+    def test_changes_and_viewer_invalidate_etag(self):
+        """Правка поста и смена пользователя меняют ETag."""
+        url = reverse('posts:index')
+        etag = self.client.get(url)['ETag']
+        self.assertNotEqual(self.author_client.get(url)['ETag'], etag)
+        self.post.text = 'Правка'
+        self.post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_new_comment_updates_last_modified(self):
+        """Новый комментарий сдвигает Last-Modified поста."""
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+        comment = Comment.objects.create(
+            post=self.post, author=self.user, text='Коммент'
+        )
+        Comment.objects.filter(pk=comment.pk).update(
+            pub_date=self.post.updated + timedelta(minutes=1)
+        )
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(COMMENTS_PER_PAGE=3)
+class CommentPaginationTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='commenter')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text=f'Коммент {number}'
+            )
+            for number in range(5)
+        ]
+
+    def content(self, response) -> str:
+        return b''.join(response.streaming_content).decode()
+
+    def next_cursor(self, html: str) -> str:
+        return re.search(r'cursor=([\w-]+)', html).group(1)
+
+    def test_post_detail_shows_first_comments(self):
+        """Пост показывает первую порцию комментариев и «Показать ещё»."""
+        html = self.content(self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk,))
+        ))
+        for number in range(3):
+            self.assertIn(f'Коммент {number}', html)
+        self.assertNotIn('Коммент 3', html)
+        self.assertIn(
+            reverse('posts:post_comments', args=(self.post.pk,)), html
+        )
+
+    def test_post_detail_streams_head_before_comments(self):
+        """Шапка страницы уходит отдельным куском до комментариев."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk,))
+        )
+        self.assertTrue(response.streaming)
+        head = next(iter(response.streaming_content)).decode()
+        self.assertIn('<head>', head)
+        self.assertIn(self.post.text, head)
+        self.assertNotIn('Коммент 0', head)
+
+    def test_fragment_returns_next_chunk(self):
+        """Фрагмент отдаёт только следующую порцию, без страницы вокруг."""
+        cursor = self.next_cursor(self.content(self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk,))
+        )))
+        html = self.content(self.client.get(
+            reverse('posts:post_comments', args=(self.post.pk,)),
+            {'cursor': cursor},
+        ))
+        self.assertIn('Коммент 3', html)
+        self.assertIn('Коммент 4', html)
+        self.assertNotIn('Коммент 2', html)
+        self.assertNotIn('<head>', html)
+        self.assertNotIn('Показать ещё', html)
+
+    def test_post_detail_accepts_comment_cursor(self):
+        """Без JavaScript ссылка открывает следующую порцию на странице."""
+        cursor = self.next_cursor(self.content(self.client.get(
+            reverse('posts:post_comments', args=(self.post.pk,))
+        )))
+        html = self.content(self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk,)),
+            {'comments': cursor},
+        ))
+        self.assertIn('Коммент 4', html)
+        self.assertNotIn('Коммент 0', html)
+
+    def test_fragment_for_missing_post_is_404(self):
+        response = self.client.get(
+            reverse('posts:post_comments', args=(self.post.pk + 100,))
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class FeedTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='feeder', first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='feeds',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Пост для ленты', group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feeds_in_every_format(self):
+        """Ленты отдаются в RSS, Atom и JSON Feed."""
+        urls = (
+            ('posts:index_feed', ()),
+            ('posts:group_feed', (self.group.slug,)),
+            ('posts:profile_feed', (self.user.username,)),
+        )
+        for name, args in urls:
+            for fmt in ('rss', 'atom', 'json'):
+                with self.subTest(name=name, fmt=fmt):
+                    response = self.client.get(
+                        reverse(name, args=(*args, fmt))
+                    )
+                    self.assertEqual(response.status_code, 200)
+                    self.assertIn('max-age', response['Cache-Control'])
+                    self.assertContains(response, 'Пост для ленты')
+                    self.assertContains(response, 'Лев Толстой')
+        response = self.client.get(
+            reverse('posts:index_feed', args=('json',))
+        )
+        self.assertEqual(
+            response.json()['items'][0]['tags'], [self.group.title]
+        )
+        response = self.client.get(
+            reverse('posts:index_feed', args=('xml',))
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_polling_costs_a_cache_lookup(self):
+        """Повторный опрос не ходит в базу, а новый пост виден сразу."""
+        url = reverse('posts:group_feed', args=(self.group.slug, 'atom'))
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            self.client.get(url)
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(
+            author=self.user, text='Ещё один пост', group=self.group
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Ещё один пост')
+
+
+class PostCardCacheTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='carder')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='cards',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Текст карточки', group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.post.refresh_from_db()
+        self.url = reverse('posts:group_list', args=(self.group.slug,))
+
+    def test_card_is_reused_until_post_is_edited(self):
+        """Карточка берётся из кеша, пока пост не изменён."""
+        self.client.get(self.url)
+        Post.objects.filter(pk=self.post.pk).update(text='мимо сигналов')
+        self.assertContains(self.client.get(self.url), 'Текст карточки')
+        self.assertContains(
+            self.client.get(reverse('posts:profile', args=('carder',))),
+            'Текст карточки',
+        )
+        self.post.text = 'Правленый текст'
+        self.post.save()
+        self.assertContains(self.client.get(self.url), 'Правленый текст')
+
+    def test_delete_and_group_change_drop_cards(self):
+        """Удаление поста и правка группы сбрасывают карточки."""
+        self.client.get(self.url)
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.assertContains(self.client.get(self.url), 'Новое название')
+        key = cards.card_key(self.post, posts_cache.generation('cards'))
+        self.assertIsNotNone(cache.get(key))
+        self.post.delete()
+        self.assertIsNone(cache.get(key))
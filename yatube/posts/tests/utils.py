@@ -0,0 +1,26 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """Проверки числа запросов к базе для тестов представлений."""
+
+    def assertMaxQueries(self, budget: int, func, *args, **kwargs):
+        """Вызов укладывается в ``budget`` запросов.
+
+        Потоковый ответ дочитывается внутри замера: его тело выбирается
+        из базы уже после выхода из представления.
+        """
+        with CaptureQueriesContext(connection) as context:
+            result = func(*args, **kwargs)
+            if getattr(result, 'streaming', False):
+                result.streaming_content = [
+                    b''.join(result.streaming_content)
+                ]
+        queries = context.captured_queries
+        if len(queries) > budget:
+            self.fail(
+                f'{len(queries)} запросов вместо не более {budget}:\n'
+                + '\n'.join(query['sql'] for query in queries)
+            )
+        return result
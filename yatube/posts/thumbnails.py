@@ -0,0 +1,123 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache as django_cache
+from django.db import close_old_connections, transaction
+from sorl.thumbnail import get_thumbnail
+from sorl.thumbnail.images import deserialize_image_file, serialize_image_file
+
+from . import cache
+from .models import Post
+
+THUMBNAIL_KEY = 'thumbnail:{}'
+RETRY_KEY = 'thumbnail-retry:{}'
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def executor() -> ThreadPoolExecutor:
+    """Общий для процесса пул потоков, создаётся при первой задаче."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def generate(name: str) -> None:
+    """Строит все миниатюры из THUMBNAIL_PRESETS для картинки ``name``.
+
+    sorl пропускает уже существующие миниатюры, поэтому повторный вызов
+    обходится чтением хранилища ключей. Готовые миниатюры кладутся в кеш
+    под ``thumbnail_key``, откуда их читает ``attach``, а поколение
+    ``posts`` сдвигается, чтобы страницы с заглушкой отрисовались заново.
+    """
+    try:
+        django_cache.set_many({
+            thumbnail_key(name, geometry, options): serialize_image_file(
+                get_thumbnail(name, geometry, **options)
+            )
+            for geometry, options in settings.THUMBNAIL_PRESETS
+        }, None)
+    except Exception:
+        logger.exception('Не удалось построить миниатюры для %s', name)
+    else:
+        cache.bump('posts')
+
+
+def _generate_in_worker(name: str) -> None:
+    try:
+        generate(name)
+    finally:
+        close_old_connections()
+
+
+def schedule(post: Post) -> None:
+    """Ставит построение миниатюр поста в очередь после коммита.
+
+    При THUMBNAIL_WORKERS = 0 миниатюры строятся в текущем потоке.
+    """
+    if not post.image:
+        return
+    name = post.image.name
+    if settings.THUMBNAIL_WORKERS:
+        transaction.on_commit(
+            lambda: executor().submit(_generate_in_worker, name)
+        )
+    else:
+        transaction.on_commit(lambda: generate(name))
+
+
+def thumbnail_key(name: str, geometry: str, options: dict) -> str:
+    """Ключ кеша, под которым лежит готовая миниатюра картинки ``name``."""
+    source = f'{name}|{geometry}|{sorted(options.items())}'
+    return THUMBNAIL_KEY.format(md5(source.encode()).hexdigest())
+
+
+def attach(posts) -> None:
+    """Проставляет постам атрибут ``thumbnail`` одним запросом к кешу.
+
+    Берётся первая геометрия из THUMBNAIL_PRESETS. Ключи миниатюр
+    страницы читаются одним get_many из кеша, куда их кладёт ``generate``.
+    Если ключа нет, атрибут остаётся None и шаблон показывает заглушку:
+    в запросе картинки не масштабируются. Пропавший ключ — миниатюра ещё
+    строится, или кеш вытеснил запись, или его очистили — уходит в
+    ``retry``.
+    """
+    geometry, options = settings.THUMBNAIL_PRESETS[0]
+    keys = {}
+    for post in posts:
+        post.thumbnail = None
+        if post.image:
+            keys[thumbnail_key(post.image.name, geometry, options)] = post
+    if not keys:
+        return
+    found = django_cache.get_many(list(keys))
+    for key, post in keys.items():
+        if key in found:
+            post.thumbnail = deserialize_image_file(found[key])
+        else:
+            retry(post.image.name, key)
+
+
+def retry(name: str, key: str) -> None:
+    """Ставит ``generate`` для картинки в фоновую очередь.
+
+    Не чаще раза в THUMBNAIL_RETRY_SECONDS на картинку. Уже построенную
+    миниатюру sorl находит в своём хранилище ключей в базе и не
+    масштабирует заново, так что потеря кеша обходится одним чтением.
+    Без фоновых потоков (THUMBNAIL_WORKERS = 0) ничего не ставится:
+    строить миниатюру в запросе дороже, чем показать заглушку.
+    """
+    if not settings.THUMBNAIL_WORKERS:
+        return
+    if django_cache.add(
+        RETRY_KEY.format(key), True, settings.THUMBNAIL_RETRY_SECONDS
+    ):
+        executor().submit(_generate_in_worker, name)
@@ -0,0 +1,249 @@
+"""Ленты подписок: раскладка при записи и чтение популярных авторов.
+
+Посты автора раскладываются по лентам подписчиков (Profile.PUSH), пока
+у него меньше FEED_PULL_THRESHOLD подписчиков. Дальше они читаются из
+таблицы постов при показе ленты (Profile.PULL). Назад автор переходит,
+только опустившись ниже FEED_PUSH_THRESHOLD, — зазор между порогами не
+даёт переключать его на каждой подписке. Возврат проходит через
+Profile.REFILL: фоновая задача раскладывает посты, накопившиеся за
+время чтения, а лента до её окончания читает автора как популярного.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from operator import attrgetter
+
+from django.conf import settings
+from django.contrib.auth.models import AbstractBaseUser
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Case, Value, When
+
+from core.db import immediate
+
+from .models import Follow, Post, Profile, TimelineEntry
+from .paginator import CursorPaginator, MergedCursorPaginator
+
+BATCH_SIZE = 500
+# Постов автора в одном INSERT при возврате в ленты: строк выходит
+# не больше REFILL_POSTS * FEED_PUSH_THRESHOLD, и блокировка записи
+# не держится долго.
+REFILL_POSTS = 100
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def _write(entries) -> None:
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def is_pulled(author_id: int) -> bool:
+    """Посты популярных авторов не раскладываются по лентам.
+
+    Их читают из таблицы постов в момент показа ленты, чтобы публикация
+    не превращалась в сотни тысяч вставок.
+    """
+    return Profile.objects.filter(
+        user_id=author_id, feed=Profile.PULL
+    ).exists()
+
+
+def pulled_authors(user: AbstractBaseUser) -> list:
+    """Авторы, которых лента пользователя читает из таблицы постов."""
+    return list(
+        Follow.objects.filter(
+            user=user,
+            author__profile__feed__in=(Profile.PULL, Profile.REFILL),
+        ).values_list('author_id', flat=True)
+    )
+
+
+def executor() -> ThreadPoolExecutor:
+    """Один поток на процесс: возвраты в ленты идут по очереди."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='timeline'
+        )
+    return _executor
+
+
+def follower_added(author_id: int) -> None:
+    """Переводит автора в PULL, когда подписчиков стало достаточно.
+
+    Вызывается после увеличения счётчика подписчиков.
+    """
+    Profile.objects.filter(
+        user_id=author_id,
+        feed=Profile.PUSH,
+        followers_count__gte=settings.FEED_PULL_THRESHOLD,
+    ).update(feed=Profile.PULL)
+
+
+def follower_removed(author_id: int) -> None:
+    """Начинает возврат автора в ленты ниже FEED_PUSH_THRESHOLD.
+
+    Вызывается после уменьшения счётчика подписчиков. Сами посты
+    раскладываются в фоновой очереди после коммита, чтобы не держать
+    запрос отписки и блокировку записи.
+    """
+    returned = Profile.objects.filter(
+        user_id=author_id,
+        feed=Profile.PULL,
+        followers_count__lt=settings.FEED_PUSH_THRESHOLD,
+    ).update(feed=Profile.REFILL)
+    if returned:
+        transaction.on_commit(
+            lambda: executor().submit(_refill_in_worker, author_id)
+        )
+
+
+def fan_out(post: Post) -> None:
+    """Раскладывает новый пост в ленты всех подписчиков автора."""
+    if is_pulled(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    _write(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post.pk,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        )
+        for user_id in followers.iterator()
+    )
+
+
+def backfill(user_id: int, author_id: int) -> None:
+    """Добавляет в ленту подписчика уже опубликованные посты автора."""
+    if is_pulled(author_id):
+        return
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('pk', 'pub_date')
+    _write(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            pub_date=pub_date,
+        )
+        for post_id, pub_date in posts.iterator()
+    )
+
+
+def prune(user_id: int, author_id: int) -> None:
+    """Убирает посты автора из ленты отписавшегося пользователя."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, author_id=author_id
+    ).delete()
+
+
+def _insert(condition: str, params: list) -> None:
+    """Раскладывает посты авторов, подходящих под ``condition``, по лентам
+    их подписчиков одним INSERT … SELECT; имеющиеся записи остаются."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {TimelineEntry._meta.db_table} '
+            '(user_id, post_id, author_id, pub_date) '
+            'SELECT follow.user_id, post.id, post.author_id, post.pub_date '
+            f'FROM {Profile._meta.db_table} profile '
+            f'JOIN {Follow._meta.db_table} follow '
+            'ON follow.author_id = profile.user_id '
+            f'JOIN {Post._meta.db_table} post '
+            'ON post.author_id = profile.user_id '
+            f'WHERE {condition} '
+            'ON CONFLICT DO NOTHING',
+            params,
+        )
+
+
+def rebuild() -> None:
+    """Раскладывает по лентам посты всех авторов, кроме популярных.
+
+    Режим авторов выставляется заново по FEED_PULL_THRESHOLD. Существующие
+    записи остаются на месте, поэтому функцию можно вызывать после
+    массовой загрузки данных в обход сигналов. Счётчики подписчиков
+    к этому моменту должны быть пересчитаны. Строки лент собираются в самой
+    базе: после загрузки их миллионы, и проход через ORM занимал бы большую
+    часть времени.
+    """
+    Profile.objects.update(feed=Case(
+        When(
+            followers_count__gte=settings.FEED_PULL_THRESHOLD,
+            then=Value(Profile.PULL),
+        ),
+        default=Value(Profile.PUSH),
+    ))
+    _insert(
+        'profile.feed = %s AND profile.followers_count > 0',
+        [Profile.PUSH],
+    )
+
+
+def refill(author_id: int) -> None:
+    """Возвращает в ленты все посты автора и переводит его в PUSH.
+
+    Посты идут порциями по REFILL_POSTS, каждая своей транзакцией.
+    Новые посты и подписчики за это время раскладываются сигналами:
+    в режиме REFILL fan_out и backfill уже работают.
+    """
+    posts = Post.objects.filter(author_id=author_id).order_by('pk')
+    last = 0
+    while True:
+        batch = list(posts.filter(pk__gt=last).values_list(
+            'pk', flat=True
+        )[:REFILL_POSTS])
+        if not batch:
+            break
+        with immediate():
+            _insert(
+                'profile.user_id = %s AND post.id > %s AND post.id <= %s',
+                [author_id, last, batch[-1]],
+            )
+        last = batch[-1]
+    Profile.objects.filter(
+        user_id=author_id, feed=Profile.REFILL
+    ).update(feed=Profile.PUSH)
+
+
+def _refill_in_worker(author_id: int) -> None:
+    try:
+        refill(author_id)
+    except Exception:
+        logger.exception(
+            'Не удалось вернуть в ленты посты автора %s', author_id
+        )
+    finally:
+        close_old_connections()
+
+
+def paginator(user: AbstractBaseUser) -> MergedCursorPaginator:
+    """Лента подписок: разложенные записи плюс посты популярных авторов.
+
+    Записи популярных авторов, оставшиеся в ленте с тех пор, как у них
+    было меньше подписчиков, пропускаются, чтобы посты не повторялись.
+    """
+    pulled = pulled_authors(user)
+    entries = TimelineEntry.objects.filter(user=user).exclude(
+        author_id__in=pulled
+    ).select_related('post__author', 'post__group')
+    sources = [(
+        CursorPaginator(entries, settings.PAGES, ('-pub_date', '-post_id')),
+        attrgetter('post'),
+    )]
+    if pulled:
+        posts = Post.objects.filter(
+            author_id__in=pulled
+        ).select_related('author', 'group')
+        sources.append((CursorPaginator(posts, settings.PAGES), None))
+    return MergedCursorPaginator(sources, settings.PAGES)
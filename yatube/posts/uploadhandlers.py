@@ -0,0 +1,93 @@
+from functools import wraps
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+from django.http import HttpRequest, HttpResponse
+from django.template.defaultfilters import filesizeformat
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from PIL import ImageFile
+
+# Сколько байт отдавать парсеру Pillow в поисках размеров картинки.
+HEADER_LIMIT = 64 * 1024
+
+
+class ImageUploadLimitHandler(FileUploadHandler):
+    """Обрывает загрузку картинки, как только она выходит за пределы.
+
+    Объём проверяется по мере поступления данных, а ширина и высота —
+    как только из первых байтов удаётся разобрать заголовок картинки.
+    Отброшенный файл не попадает ни в память, ни во временный файл,
+    а причина отказа складывается в ``request.upload_errors``.
+    """
+
+    def __init__(self, request: HttpRequest = None) -> None:
+        super().__init__(request)
+        self.errors = {}
+        if request is not None:
+            request.upload_errors = self.errors
+
+    def new_file(self, field_name, *args, **kwargs) -> None:
+        super().new_file(field_name, *args, **kwargs)
+        self.received = 0
+        self.parser = ImageFile.Parser()
+        if (self.content_length is not None
+                and self.content_length > settings.IMAGE_UPLOAD_MAX_SIZE):
+            self.reject_size()
+
+    def receive_data_chunk(self, raw_data: bytes, start: int) -> bytes:
+        self.received += len(raw_data)
+        if self.received > settings.IMAGE_UPLOAD_MAX_SIZE:
+            self.reject_size()
+        if self.parser is not None:
+            self.check_dimensions(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size: int) -> None:
+        self.parser = None
+
+    def check_dimensions(self, raw_data: bytes) -> None:
+        try:
+            self.parser.feed(raw_data)
+        except (IOError, SyntaxError, ValueError):
+            # Не картинка: это скажет валидация поля формы.
+            self.parser = None
+            return
+        image = self.parser.image
+        if image is None:
+            if self.received > HEADER_LIMIT:
+                self.parser = None
+            return
+        self.parser = None
+        max_width, max_height = settings.IMAGE_UPLOAD_MAX_DIMENSIONS
+        width, height = image.size
+        if width > max_width or height > max_height:
+            self.reject(
+                f'Картинка {width}×{height} больше допустимых '
+                f'{max_width}×{max_height} точек.'
+            )
+
+    def reject_size(self) -> None:
+        limit = filesizeformat(settings.IMAGE_UPLOAD_MAX_SIZE)
+        self.reject(f'Файл больше допустимых {limit}.')
+
+    def reject(self, message: str) -> None:
+        self.errors[self.field_name] = message
+        self.parser = None
+        raise SkipFile(message)
+
+
+def limit_image_uploads(view):
+    """Ставит ImageUploadLimitHandler первым обработчиком загрузок.
+
+    Обработчик нужно добавить до первого чтения request.POST, а проверка
+    CSRF в middleware читает его раньше представления, поэтому она
+    переносится внутрь декоратора.
+    """
+    protected_view = csrf_protect(view)
+
+    @csrf_exempt
+    @wraps(view)
+    def wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        request.upload_handlers.insert(0, ImageUploadLimitHandler(request))
+        return protected_view(request, *args, **kwargs)
+    return wrapper
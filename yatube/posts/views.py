@@ -1,35 +1,47 @@
 from datetime import datetime
+from typing import Iterator
 
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
-from django.http import HttpRequest, HttpResponse
+from django.http import Http404, HttpRequest, HttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import get_template, render_to_string
+from django.views.decorators.http import condition
 
-from yatube.settings import PAGES
+from core.db import immediate
+from core.routers import read_replica
+from core.streaming import stream, stream_render
 
+from . import cards, feeds, freshness, thumbnails, timeline
 from .forms import CommentForm, PostForm
 from .models import Comment, Follow, Group, Post, User
+from .paginator import NEXT, CursorPaginator, paginate
+from .search import SearchPaginator
+from .uploadhandlers import limit_image_uploads
 
 
+@read_replica
+@condition(etag_func=freshness.index_etag,
+           last_modified_func=freshness.index_last_modified)
 def index(request: HttpRequest) -> HttpResponse:
     """Создание страницы со свежими постами."""
-    post_list = Post.objects.select_related('group').all()
-    paginator = Paginator(post_list, PAGES)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    context = {
-        'page_obj': page_obj,
-    }
-    return render(request, 'posts/index.html', context)
+    post_list = Post.objects.select_related('author', 'group')
+    page_obj = paginate(request, post_list)
+    cards.attach(page_obj)
+    return render(request, 'posts/index.html', {'page_obj': page_obj})
 
 
+@read_replica
+@condition(etag_func=freshness.group_etag,
+           last_modified_func=freshness.group_last_modified)
 def group_posts(request: HttpRequest, slug: str) -> HttpResponse:
     """Создание страницы с постами, отфильтрованными по группе."""
     group = get_object_or_404(Group, slug=slug)
-    post_list = Post.objects.filter(group=group)
-    paginator = Paginator(post_list, PAGES)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.filter(group=group).select_related(
+        'author', 'group'
+    )
+    page_obj = paginate(request, post_list)
+    cards.attach(page_obj)
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -37,21 +49,57 @@ def group_posts(request: HttpRequest, slug: str) -> HttpResponse:
     return render(request, 'posts/group_list.html', context)
 
 
+def search(request: HttpRequest) -> HttpResponse:
+    """Создание страницы с результатами поиска по текстам постов."""
+    query = request.GET.get('q', '').strip()
+    paginator = SearchPaginator(query, settings.PAGES)
+    page_obj = paginator.cursor_page(request.GET.get('cursor'))
+    thumbnails.attach(page_obj)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@condition(etag_func=feeds.etag)
+def index_feed(request: HttpRequest, fmt: str) -> HttpResponse:
+    """Лента свежих постов в RSS, Atom или JSON Feed."""
+    return feeds.serve(request, fmt, feeds.index_channel)
+
+
+@condition(etag_func=feeds.etag)
+def group_feed(request: HttpRequest, slug: str, fmt: str) -> HttpResponse:
+    """Лента постов группы."""
+    return feeds.serve(request, fmt, feeds.group_channel, slug)
+
+
+@condition(etag_func=feeds.etag)
+def profile_feed(request: HttpRequest, username: str,
+                 fmt: str) -> HttpResponse:
+    """Лента постов автора."""
+    return feeds.serve(request, fmt, feeds.profile_channel, username)
+
+
+@read_replica
+@condition(etag_func=freshness.profile_etag,
+           last_modified_func=freshness.profile_last_modified)
 def profile(request: HttpRequest, username: str) -> HttpResponse:
     """Создание страницы профиля."""
     user = request.user
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    count_posts = author.posts.count
+    author = get_object_or_404(
+        User.objects.select_related('profile'), username=username
+    )
+    posts = author.posts.select_related('group')
+    count_posts = author.profile.posts_count
     if request.user.is_authenticated:
         following = Follow.objects.filter(
             user=user, author=author
         ).exists()
     else:
         following = False
-    paginator = Paginator(posts, PAGES)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginate(request, posts)
+    cards.attach(page_obj)
     context = {
         'author': author,
         'posts': posts,
@@ -62,79 +110,130 @@ def profile(request: HttpRequest, username: str) -> HttpResponse:
     return render(request, 'posts/profile.html', context,)
 
 
+@read_replica
+@condition(etag_func=freshness.post_etag,
+           last_modified_func=freshness.post_last_modified)
 def post_detail(request: HttpRequest, post_id: int) -> HttpResponse:
     """Создание страницы с описанием поста."""
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__profile', 'group'), pk=post_id
+    )
     group = post.group
     author = post.author
-    count_posts = author.posts.count
+    count_posts = author.profile.posts_count
     form = CommentForm(request.POST or None)
-    comments = Comment.objects.filter(post=post)
     context = {
         'post': post,
         'group': group,
         'author': author,
-        'comments': comments,
         'count_posts': count_posts,
         'form': form,
     }
-    return render(request, 'posts/post_detail.html', context)
+    return stream_render(
+        request, 'posts/post_detail.html', context,
+        comment_chunks(request, post_id, request.GET.get('comments')),
+    )
+
+
+def comment_chunks(request: HttpRequest, post_id: int,
+                   cursor: str = None) -> Iterator[str]:
+    """HTML порции комментариев поста от старых к новым после курсора.
+
+    Строки читаются итератором по индексу (post, pub_date) и уходят
+    кусками по STREAM_CHUNK_SIZE, так что первая страница обсуждения в
+    50 тысяч комментариев стоит столько же, сколько в десять. Порцию
+    замыкает ссылка «Показать ещё», если дальше что-то есть.
+    """
+    paginator = CursorPaginator(
+        Comment.objects.filter(post_id=post_id).select_related('author'),
+        settings.COMMENTS_PER_PAGE,
+        ('pub_date', 'pk'),
+    )
+    direction, position = paginator.decode_cursor(cursor)
+    comments = paginator.object_list
+    if direction == NEXT and position is not None:
+        comments = comments.filter(paginator.after(position, False))
+    template = get_template('posts/includes/comment.html')
+    rows = comments[:paginator.per_page + 1].iterator(
+        chunk_size=settings.STREAM_CHUNK_SIZE
+    )
+    chunk = []
+    last = None
+    for number, comment in enumerate(rows):
+        if number == paginator.per_page:
+            chunk.append(render_to_string(
+                'posts/includes/more_comments.html',
+                {
+                    'post_id': post_id,
+                    'cursor': paginator.encode_cursor(NEXT, last),
+                },
+            ))
+            break
+        chunk.append(template.render({'comment': comment}, request))
+        last = comment
+        if len(chunk) >= settings.STREAM_CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+    yield ''.join(chunk)
+
+
+@read_replica
+@condition(etag_func=freshness.comments_etag,
+           last_modified_func=freshness.post_last_modified)
+def post_comments(request: HttpRequest, post_id: int) -> HttpResponse:
+    """Фрагмент со следующей порцией комментариев для «Показать ещё»."""
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    return stream(
+        comment_chunks(request, post_id, request.GET.get('cursor'))
+    )
 
 
 @login_required
+@limit_image_uploads
 def post_create(request: HttpRequest) -> HttpResponse:
     """Страница для создание новых постов."""
     author = request.user
-    if request.method != 'POST':
-        form = PostForm()
-        context = {
-            'form': form
-        }
-        return render(request, 'posts/create_post.html', context)
-    form = PostForm(request.POST)
+    form = PostForm(
+        request.POST or None,
+        files=request.FILES or None,
+        upload_errors=request.upload_errors,
+    )
     if not form.is_valid():
         context = {
             'form': form,
         }
         return render(request, 'posts/create_post.html', context)
-    form = PostForm(
-        request.POST or None,
-        files=request.FILES or None,
-    )
     post = form.save(commit=False)
     post.author = author
     post.pub_date = datetime.now()
-    post.save()
+    with immediate():
+        post.save()
     return redirect('posts:profile', author)
 
 
 @login_required
+@limit_image_uploads
 def post_edit(request: HttpRequest, post_id: int) -> HttpResponse:
     """Создание страницы для редактирования постов."""
     author = request.user
     post = get_object_or_404(Post, id=post_id)
-    if request.method != 'POST':
-        form = PostForm()
-        context = {
-            'form': form,
-            'is_edit': True,
-        }
-        return render(request, 'posts/create_post.html', context)
-    form = PostForm(request.POST)
+    form = PostForm(
+        request.POST or None,
+        files=request.FILES or None,
+        instance=post,
+        upload_errors=request.upload_errors,
+    )
     if not form.is_valid():
         context = {
             'form': form,
             'is_edit': True,
         }
         return render(request, 'posts/create_post.html', context)
-    form = PostForm(
-        request.POST or None,
-        files=request.FILES or None,
-        instance=post
-    )
     post = form.save(commit=False)
     post.author = author
-    post.save()
+    with immediate():
+        post.save()
     return redirect('posts:post_detail', post_id)
 
 
@@ -147,18 +246,23 @@ def add_comment(request: HttpRequest, post_id: int) -> HttpResponse:
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with immediate():
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@read_replica
 @login_required
 def follow_index(request: HttpRequest) -> HttpResponse:
     """Создание страницы с постами понравившихся авторов."""
     user = request.user
     post_list = Post.objects.filter(author__following__user=user)
-    paginator = Paginator(post_list, PAGES)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginate(
+        request,
+        post_list,
+        cursor_paginator=timeline.paginator(user),
+    )
+    cards.attach(page_obj)
     context = {
         'page_obj': page_obj,
     }
@@ -171,7 +275,8 @@ def profile_follow(request: HttpRequest, username: str) -> HttpResponse:
     author = get_object_or_404(User, username=username)
     user = request.user
     if author != user:
-        Follow.objects.get_or_create(author=author, user=user)
+        with immediate():
+            Follow.objects.get_or_create(author=author, user=user)
     return redirect('posts:profile', author)
 
 
@@ -181,5 +286,6 @@ def profile_unfollow(request: HttpRequest, username: str) -> HttpResponse:
     author = get_object_or_404(User, username=username)
     user = request.user
     follower = get_object_or_404(Follow, user=user, author=author)
-    follower.delete()
+    with immediate():
+        follower.delete()
     return redirect('posts:profile', author)
@@ -51,10 +51,12 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -89,9 +91,58 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        'CONN_MAX_AGE': 600,
+    },
+    # Копия default, которую обновляет команда sync_replica. Пока файла
+    # нет, представления читают с основной базы.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db-replica.sqlite3'),
+        'CONN_MAX_AGE': 600,
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
+}
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+DATABASE_REPLICAS = ['replica']
+
+REPLICA_SYNC_INTERVAL = 5
+
+# Реплика, не обновлявшаяся дольше этого, считается отставшей, и запросы
+# читают с основной базы, пока sync_replica её не догонит.
+REPLICA_MAX_LAG = 3 * REPLICA_SYNC_INTERVAL
+
+# Дольше интервала синхронизации, чтобы автор успел увидеть свою запись.
+REPLICA_STICKY_SECONDS = 15
+
+REPLICA_STICKY_COOKIE = 'primary'
+
+# Записи этих приложений не закрепляют клиента за основной базой: sorl
+# пишет в хранилище ключей, когда строит миниатюру при показе страницы.
+REPLICA_UNTRACKED_APPS = ['thumbnail']
+
+# Применяются к каждому новому соединению (core.db.configure_sqlite).
+# WAL пускает читателей параллельно с писателем, NORMAL в WAL не теряет
+# целостность при сбое процесса, mmap и кеш страниц экономят системные
+# вызовы на чтении.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
 }
 
+# Повторы BEGIN IMMEDIATE в core.db.immediate, если блокировку записи
+# не удалось получить за busy_timeout; задержка удваивается с каждой.
+WRITE_RETRIES = 4
+
+WRITE_BACKOFF = 0.05
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -143,14 +194,84 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 PAGES = 10
 
+COMMENTS_PER_PAGE = 20
+
+STREAM_CHUNK_SIZE = 10
+
+# Автор с FEED_PULL_THRESHOLD подписчиков перестаёт раскладываться по
+# лентам и возвращается туда, только опустившись ниже FEED_PUSH_THRESHOLD.
+FEED_PULL_THRESHOLD = 1000
+
+FEED_PUSH_THRESHOLD = 800
+
+FEED_SIZE = 20
+
+FEED_MAX_AGE = 5 * 60
+
+FEED_CACHE_TIMEOUT = 24 * 60 * 60
+
+CARD_CACHE_TIMEOUT = 24 * 60 * 60
+
+PROFILING_SAMPLE_RATE = 0.0
+
+PROFILING_HEADER = 'HTTP_X_PROFILE'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.middleware': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+IMAGE_UPLOAD_MAX_SIZE = 5 * 1024 * 1024
+
+IMAGE_UPLOAD_MAX_DIMENSIONS = (6000, 6000)
+
+THUMBNAIL_PRESETS = [
+    ('960x339', {'crop': 'center', 'upscale': True}),
+]
+
+THUMBNAIL_WORKERS = 2
+
+# Как часто лента может заново ставить в очередь миниатюру, которой нет
+# в кеше.
+THUMBNAIL_RETRY_SECONDS = 60
+
+# Каждый процесс держит небольшой LRU перед общим кешем в файле SQLite,
+# который видят все воркеры этой копии проекта. Тесты переносят его
+# во временный каталог, см. core.runner.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.TwoTierCache',
+        'LOCATION': 'shared',
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+            'LOCAL_TIMEOUT': 5,
+        },
+    },
+    'shared': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_PATH', os.path.join(BASE_DIR, 'cache.sqlite3')
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
 }
+
+TEST_RUNNER = 'core.runner.TestRunner'